@@ -1,5 +1,36 @@
 import numpy as np
 import pandas as pd
+from sim_utils.audit_store import AuditStore
+from sim_utils.helper_functions import mser_truncation
+
+# Largest fraction of a run that MSER warm up detection may delete
+MSER_MAX_FRACTION = 0.5
+
+# Completed jobs leave the model rather than queue, but samples completed are
+# still reported as this queue in maximum queue sizes
+COMPLETED_QUEUE = 'q_completed'
+
+# Daily queue statistics recorded
+QUEUE_STATISTICS = ['mean', 'max', 'mean_samples', 'max_samples']
+
+# Queue time results -> quantile
+QUEUE_TIME_QUANTILES = {'min': 0, '1Q': 0.25, 'median': 0.5, '3Q': 0.75,
+                        '95_percent': 0.95, 'max': 1}
+
+
+def queue_time_summary(sketches):
+    """Summarise times in queue from quantile sketches (queue -> sketch) as a
+    DataFrame with one row per queue used, and a column for each queue time
+    result"""
+    records = []
+    for key, sketch in sketches.items():
+        if sketch.count > 0:
+            record = {'queue': key}
+            for result, q in QUEUE_TIME_QUANTILES.items():
+                record[result] = sketch.quantile(q)
+            records.append(record)
+    columns = ['queue'] + list(QUEUE_TIME_QUANTILES)
+    return pd.DataFrame(records, columns=columns).round(1)
 
 
 class Audit:
@@ -8,49 +39,115 @@ class Audit:
 
         self._env = _process._env
         self._params = _process._params
+        self._plan = _process._plan
+        self._resources_on_shift = _process.resources_on_shift
         self._queues = _process.queues
         self._queue_monitors = _process.queue_monitors
         self._recources = _process.resources
         self._count_in = _process.count_in
         self._count_out = _process.count_out
-        self._fte_on_break = _process.fte_on_break
+        self._trackers = _process.trackers
+        self._resources_by_id = _process.resource_list
+
+        # Results before warm up (minutes, and whole days) are ignored. In
+        # 'mser' warm up mode these are set at the end of the run.
+        self.warm_up = self._params.audit_warm_up
+        self.warm_up_days = self._params.warm_up_days
+
+        # Audit records (one row per audit interval)
+        expected_audits = (self._params.run_length /
+                           self._params.audit_interval) + 1
 
         # Set up queue audit
         self.queue_names = ['day'] + [
             key for key in self._queues.keys()]
-        self.queue_audit = pd.DataFrame(columns=self.queue_names)
+        self._queue_list = list(self._queues.values())
+        # Queue statistics for each day (array, queue x QUEUE_STATISTICS)
+        self._queue_statistics = []
+        # Resource use to the end of each day (array, (busy time on shift,
+        # time on shift) x resource id)
+        self._resource_usage = []
+        self._queue_store = AuditStore(self.queue_names, expected_audits)
 
         # Set up resources audit
         self.resource_names = ['day'] + [
             key for key in self._recources.keys()]
-        self.resource_audit = pd.DataFrame(columns=self.resource_names +
-                                                   ['tracker_break_fte'])
+        self._resource_list = list(self._recources.values())
+        shift_names = [resource + '_shift' for resource in
+                       self._plan.resource_names]
+        self._resource_store = AuditStore(
+            self.resource_names + shift_names,
+            expected_audits)
+
+    @property
+    def queue_audit(self):
+        """Queue audit DataFrame (built from audit records)"""
+        return self._queue_store.to_dataframe()
+
+    @property
+    def resource_audit(self):
+        """Resource audit DataFrame (built from audit records)"""
+        return self._resource_store.to_dataframe()
 
     def audit_queue(self):
-        day = self._env.now
-        audit_counts = {key: value.qsize() for key, value in self._queues.items()}
-        audit_counts['day'] = day / self._params.day_duration
-        self.queue_audit = self.queue_audit.append(
-            audit_counts, ignore_index=True)
+        day = self._env.now / self._params.day_duration
+        self._queue_store.record(
+            [day] + [len(queue) for queue in self._queue_list])
 
     def audit_resources(self):
+        day = self._env.now / self._params.day_duration
+        self._resource_store.record(
+            [day] +
+            [resource.count for resource in self._resource_list] +
+            self._resources_on_shift)
+
+    def daily_series(self, days):
+        """
+        Daily series used to detect warm up, for the first `days` whole days:
+        samples completed each day, and mean samples queued (all queues) in
+        each day. Daily values remove the daily cycle of deliveries and
+        shifts. Returns NumPy array (series x days).
+        """
+
+        day_duration = self._params.day_duration
+
+        output = np.zeros(days)
+        if len(self._count_out) > 0:
+            count_out = np.array(self._count_out, dtype=float)
+            day = (count_out[:, 1] // day_duration).astype(int)
+            keep = day < days
+            output = np.bincount(day[keep], weights=count_out[keep, 2],
+                                 minlength=days)
+
+        queued = self.queue_statistics(days)[:, :, 2].sum(axis=1)
+
+        return np.vstack([output, queued])
+
+    def detect_warm_up_days(self, days):
+        """Whole days of warm up in first `days` days (MSER on each daily
+        series, using the longest), and the most days that may be detected.
+        Detection at that limit suggests steady state is not yet reached."""
+        warm_up_days = max(mser_truncation(values, MSER_MAX_FRACTION)
+                           for values in self.daily_series(days))
+        return warm_up_days, int(days * MSER_MAX_FRACTION)
+
+    def set_warm_up(self):
+        """Set warm up before which results are ignored (detected from audit
+        series in 'mser' warm up mode)."""
+        if self._params.warm_up_mode == 'mser':
+            days = int(self._env.now // self._params.day_duration)
+            self.warm_up_days, _limit = self.detect_warm_up_days(days)
+        else:
+            self.warm_up_days = self._params.warm_up_days
+        self.warm_up = self.warm_up_days * self._params.day_duration
 
-        time = self._env.now
-        day = int(time / self._params.day_duration)
-        time_of_day = time - (day * self._params.day_duration)
-
-        resource_counts = {key: value.count for key, value in
-                           self._recources.items()}
-        resource_counts['tracker_break_fte'] = self._fte_on_break[0]
-        resource_counts['day'] = time / self._params.day_duration
-        for resource, shift in self._params.resource_shifts.items():
-            label = resource + '_shift'
-            if shift[0] < time_of_day < shift[1]:
-                resource_counts[label] = 1
-            else:
-                resource_counts[label] = 0
-        self.resource_audit = self.resource_audit.append(resource_counts,
-                                                         ignore_index=True)
+    def steady_state_reached(self):
+        """True if steady state has been detected in the whole days run so
+        far, and run_days of results after warm up have been collected."""
+        days = int(self._env.now // self._params.day_duration)
+        warm_up_days, limit = self.detect_warm_up_days(days)
+        return (warm_up_days < limit and
+                days - warm_up_days >= self._params.run_days)
 
     def summarise_in_out(self):
         incount = self._count_in
@@ -67,8 +164,8 @@ class Audit:
         df_out['day'] = day
 
         # Remove valaues before warm up
-        df_in = df_in.loc[df_in['time_mins'] >= self._params.audit_warm_up]
-        df_out = df_out.loc[df_out['time_mins'] >= self._params.audit_warm_up]
+        df_in = df_in.loc[df_in['time_mins'] >= self.warm_up]
+        df_out = df_out.loc[df_out['time_mins'] >= self.warm_up]
 
         df_in_pivot = df_in.pivot_table(
             index='day',
@@ -132,68 +229,83 @@ class Audit:
         self.summary_output = pd.DataFrame(self.summary_output)
         self.summary_output.rename(columns={0: 'Result'}, inplace=True)
         self.summary_output = self.summary_output.round(2)
+        self.summary_output.loc['warm_up_days'] = self.warm_up_days
+
+    def queue_statistics(self, days=None):
+        """Queue statistics by day (NumPy array, day x queue x
+        QUEUE_STATISTICS), for all days run or the first `days` days."""
+        self.record_daily_statistics()
+        statistics = self._queue_statistics[:days]
+        if len(statistics) == 0:
+            return np.empty((0, len(self._queue_list), len(QUEUE_STATISTICS)))
+        return np.array(statistics)
+
+    def record_daily_statistics(self):
+        """If a whole day has ended since last recorded, record statistics of
+        each queue for the day (and restart queue statistics), and resource
+        use to the end of the day. Queues and resources (TrackedResource) track
+        statistics exactly, on every change."""
+        days = int(self._env.now // self._params.day_duration)
+        if len(self._queue_statistics) >= days:
+            return
+        self._queue_statistics.append(np.array(
+            [[queue.mean_length(), queue.max_length, queue.mean_samples(),
+              queue.max_samples] for queue in self._queue_list],
+            dtype=float))
+        for queue in self._queue_list:
+            queue.reset_stats()
+        usage = [(0.0, 0.0) if resource is None else resource.usage()
+                 for resource in self._resources_by_id]
+        self._resource_usage.append(np.array(usage, dtype=float).T)
+
+    def resource_usage(self):
+        """Busy time on shift (time x resources occupied) and time on shift
+        of each resource (by resource id) after warm up (NumPy arrays)"""
+        self.record_daily_statistics()
+        usage = self._resource_usage[-1]
+        if self.warm_up_days > 0:
+            usage = usage - self._resource_usage[self.warm_up_days - 1]
+        return usage[0], usage[1]
+
+    def run_daily_statistics(self):
+        """Record queue statistics and resource use at the end of each
+        day"""
+        while True:
+            yield self._env.timeout(self._params.day_duration)
+            self.record_daily_statistics()
 
     def summarise_queues(self):
-
-        queue_units = {
-            'q_batch_input': 0,
-            'q_sample_preprocess': self._params.basic_batch_size,
-            'q_sample_receipt': self._params.basic_batch_size,
-            'q_sample_prep': self._params.basic_batch_size,
-            'q_heat': self._params.basic_batch_size * \
-                      self._params.heat_batch_size,
-            'q_heat_collation': self._params.basic_batch_size,
-            'q_heat_split': self._params.basic_batch_size * \
-                            self._params.heat_batch_size,
-            'q_rna_collation': self._params.basic_batch_size,
-            'q_rna_extraction': self._params.basic_batch_size * \
-                                self._params.rna_extraction_batch_size,
-            'q_rna_extraction_split': self._params.basic_batch_size * \
-                                      self._params.rna_extraction_batch_size,
-            'q_pcr_collation': self._params.basic_batch_size,
-            'q_pcr_prep': self._params.basic_batch_size * 4,
-            'q_pcr': self._params.basic_batch_size * 4,
-            'q_data_analysis': self._params.basic_batch_size * 4,
-            'q_completed': self._params.basic_batch_size * 4,
-            'q_transfer_1': self._params.basic_batch_size * \
-                            self._params.transfer_1_batch_size,
-            'q_transfer_1_collation': self._params.basic_batch_size,
-            'q_transfer_1_split': self._params.basic_batch_size * \
-                                  self._params.transfer_1_batch_size
-        }
-
-        queued_units = pd.DataFrame()
-        for key, value in queue_units.items():
-            queue_samples = self.queue_audit[key] * value
-            queued_units[key] = queue_samples
-
-        self.max_queue_sizes = queued_units.max()
+        """Maximum samples queued after warm up (exact, from queue
+        statistics), and samples completed in the run (as 'q_completed')"""
+        statistics = self.queue_statistics()[self.warm_up_days:]
+        max_samples = (statistics[:, :, 3].max(axis=0) if len(statistics) > 0
+                       else np.nan)
+        self.max_queue_sizes = pd.Series(max_samples,
+                                         index=list(self._queues.keys()))
+        self.max_queue_sizes[COMPLETED_QUEUE] = float(
+            sum(output_log[2] for output_log in self._count_out))
+
+    def summarise_queue_lengths(self):
+        """Time-weighted mean and maximum queue lengths (number of queued
+        items) and samples queued after warm up, from queue statistics."""
+        statistics = self.queue_statistics()[self.warm_up_days:]
+        self.queue_lengths = pd.DataFrame(index=list(self._queues.keys()),
+                                          columns=QUEUE_STATISTICS,
+                                          dtype=float)
+        if len(statistics) > 0:
+            self.queue_lengths['mean'] = statistics[:, :, 0].mean(axis=0)
+            self.queue_lengths['max'] = statistics[:, :, 1].max(axis=0)
+            self.queue_lengths['mean_samples'] = \
+                statistics[:, :, 2].mean(axis=0)
+            self.queue_lengths['max_samples'] = \
+                statistics[:, :, 3].max(axis=0)
+        self.queue_lengths = self.queue_lengths.round(1)
 
     def summarise_queue_times(self):
+        """Summarise times in queue from queue monitor quantile sketches"""
 
-        self.queue_times = pd.DataFrame()
-        keys = []
-
-        for key, value in self._queue_monitors.items():
-
-            if len(value) > 0:
-                keys.append(key)
-                results = dict()
-                array = np.array(value)
-                times = array[:, 1] - array[:, 0]
-                results['min'] = np.min(times)
-                results['1Q'] = np.quantile(times, 0.25)
-                results['median'] = np.median(times)
-                results['3Q'] = np.quantile(times, 0.75)
-                results['95_percent'] = np.quantile(times, 0.95)
-                results['max'] = np.max(times)
-                self.queue_times = self.queue_times.append(pd.Series(results),
-                                                           ignore_index=True)
-
-        self.queue_times['queue'] = keys
-        cols = ['queue', 'min', '1Q', 'median', '3Q', '95_percent', 'max']
-        self.queue_times = self.queue_times[cols]
-        self.queue_times = self.queue_times.round(1)
+        self.queue_time_sketches = self._queue_monitors
+        self.queue_times = queue_time_summary(self.queue_time_sketches)
 
     def summarise_resources_with_shifts(self):
         index = [key for key, value in self._params.resource_numbers.items() if
@@ -204,15 +316,20 @@ class Audit:
 
         columns = ['Available', 'Used', 'Utilisation']
 
+        # Exact time-weighted use, when on shift
+        busy_on_shift_time, on_shift_time = self.resource_usage()
 
         self.summary_resources = pd.DataFrame(index=index, columns=columns)
         for resource in index:
             # Get number available on-shift
             available = self._params.resource_numbers[resource]
-            # Get resource use only when resources are on-shift
-            resource_shift = resource + '_shift'
-            mask = self.resource_audit[resource_shift] == 1
-            mean_resources_use = self.resource_audit[resource][mask].mean()
+            # Get mean resource use only when resources are on-shift
+            resource_id = self._plan.resource_ids[resource]
+            if on_shift_time[resource_id] > 0:
+                mean_resources_use = (busy_on_shift_time[resource_id] /
+                                      on_shift_time[resource_id])
+            else:
+                mean_resources_use = np.nan
             mean_utilisation = mean_resources_use / available
             # Put results in dictionary
             result = {'Available': available,
@@ -223,31 +340,19 @@ class Audit:
             
 
     def summarise_trackers(self):
-        """Aggregate trackers by hour"""
-        self.tracker_results = pd.DataFrame()
-        df = self.resource_audit.copy()
-        index = list(df)
-        # Get tracker columns (remove whether on shift or not for trackers
-        index = [item for item in index if item[0:7] == 'tracker' and
-                 item[-6:] != '_shift']
-        if len(index) == 0:
-            # No trackers active
-            return
-        day_fraction = df['day'] % 1.0
-        hour = day_fraction.values * 24
-        df['hour'] = hour.astype(int)
-        self.tracker_results = df.pivot_table(
-            index='hour',
-            aggfunc=[np.mean],
-            margins=False)
-        # Limit table
-        self.tracker_results = self.tracker_results['mean'][index]
+        """Aggregate trackers by hour (time-weighted mean count in each hour
+        of the day, after warm up)"""
+        self.tracker_results = self._trackers.hourly_means(self.warm_up_days)
 
 
     def run_audit(self):
-        yield self._env.timeout(self._params.audit_warm_up)
+        # In 'mser' warm up mode audit from time zero
+        if self._params.warm_up_mode == 'fixed':
+            yield self._env.timeout(self._params.audit_warm_up)
 
         while True:
-            self.audit_queue()
-            self.audit_resources()
+            if self._params.audit_queue_lengths:
+                self.audit_queue()
+            if self._params.audit_resource_use:
+                self.audit_resources()
             yield self._env.timeout(self._params.audit_interval)
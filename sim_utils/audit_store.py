@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+
+class AuditStore:
+    """
+    Preallocated table of audit records. Each audit writes one row of a NumPy
+    array (one column per audited item), so recording an audit is a few array
+    stores rather than a DataFrame append. The array is sized for the
+    expected number of audits in a run (and doubles in size if more are
+    recorded). The DataFrame is built when first asked for after new records
+    are added.
+
+    Attributes
+    ----------
+    columns: Column names (list)
+    rows: Number of records (int)
+
+    Methods
+    -------
+    record:
+        Record a row of values (in column order)
+
+    to_dataframe:
+        Return records as a pandas DataFrame
+
+    values:
+        Return records as a NumPy array (view, rows x columns)
+
+    """
+
+    def __init__(self, columns, expected_rows):
+        """
+        Constructor method for audit store
+
+        Parameters
+        ----------
+        columns : list
+            Column names
+        expected_rows : int
+            Number of records to allocate space for
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.columns = list(columns)
+        self.rows = 0
+        self._array = np.zeros((max(int(expected_rows), 1), len(self.columns)))
+        self._dataframe = None
+
+    def record(self, values):
+        if self.rows == self._array.shape[0]:
+            self._array = np.concatenate(
+                [self._array, np.zeros_like(self._array)])
+        self._array[self.rows] = values
+        self.rows += 1
+        self._dataframe = None
+
+    def to_dataframe(self):
+        if self._dataframe is None:
+            self._dataframe = pd.DataFrame(self.values(), columns=self.columns)
+        return self._dataframe
+
+    def values(self):
+        return self._array[:self.rows]
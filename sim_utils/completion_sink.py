@@ -0,0 +1,177 @@
+import pandas as pd
+
+from sim_utils.audit import MSER_MAX_FRACTION
+from sim_utils.quantile_sketch import QuantileSketch
+
+# Time stamps summarised for completed entities
+TIME_STAMP_FIELDS = (
+    'sample_preprocess_in', 'sample_preprocess_out',
+    'sample_receipt_in', 'sample_receipt_out',
+    'sample_prep_auto_in', 'sample_prep_auto_out',
+    'sample_prep_manual_in', 'sample_prep_manual_out',
+    'sample_heat_in', 'sample_heat_out',
+    'rna_extraction_in', 'rna_extraction_out',
+    'pcr_prep_in', 'pcr_prep_out',
+    'pcr_in', 'pcr_out',
+    'data_analysis_in', 'data_analysis_out')
+
+
+class CompletionSink:
+    """
+    Streaming aggregation of completed entities. Entities are summarised as
+    they leave the model (after data analysis) rather than being held in a
+    queue until the end of the run, so memory use does not grow with run
+    length.
+
+    For each completed entity that arrived after warm up the time of each
+    process step time stamp (measured from time in) is added to a quantile
+    sketch for its arrival day bucket and priority, and the entity is counted
+    against whether it completed within 24 hours. The entity time stamp row
+    is then released.
+
+    In 'fixed' warm up mode all entities arriving after warm up share one
+    bucket (sketches by priority only). In 'mser' warm up mode, where the warm
+    up is chosen at the end of the run, each day that may be detected as warm
+    up has its own bucket and all later days share one bucket, so memory does
+    not grow with run length in either mode.
+
+    Attributes
+    ----------
+    complete_in_24hrs: (Day bucket, priority) -> number of entities completed
+        in 24 hours
+    count: (Day bucket, priority) -> number of entities completed
+    cutoff: Time in (minutes) before which completed entities are ignored
+    fields: Time stamps summarised (list)
+    last_bucket: First day of the bucket shared by all later days
+    sketches: (Day bucket, priority) -> time stamp -> QuantileSketch
+
+    Methods
+    -------
+    add:
+        Aggregate a completed entity and release its time stamps
+
+    summarise:
+        Return time stamp medians, medians and 95th percentiles by priority,
+        and proportion complete in 24 hours (pandas objects), for entities
+        arriving after a given warm up
+
+    """
+
+    def __init__(self, _process):
+
+        self._params = _process._params
+        self._time_stamps = _process.time_stamps
+        if self._params.warm_up_mode == 'mser':
+            self.cutoff = 0
+            self.last_bucket = int(self._params.result_days *
+                                   MSER_MAX_FRACTION)
+        else:
+            self.cutoff = self._params.audit_warm_up
+            self.last_bucket = self._params.warm_up_days
+
+        self.fields = list(TIME_STAMP_FIELDS)
+
+        column_ids = self._time_stamps.column_ids
+        self._time_in_column = column_ids['time_in']
+        self._field_columns = [column_ids[field] for field in self.fields]
+        self._completed_column = column_ids['data_analysis_out']
+
+        self.complete_in_24hrs = dict()
+        self.count = dict()
+        self.sketches = dict()
+
+    def add(self, entity):
+        """Aggregate completed entity and release its time stamp row."""
+        row = self._time_stamps.get_rows(entity.time_stamp_row)
+        self._time_stamps.release(entity.time_stamp_row)
+
+        time_in = row[self._time_in_column]
+        if time_in < self.cutoff:
+            return
+
+        priority = int(entity.priority / 100) + 1
+        day = int(time_in // self._params.day_duration)
+        key = (min(day, self.last_bucket), priority)
+        if key not in self.sketches:
+            self.sketches[key] = {
+                field: QuantileSketch() for field in self.fields}
+            self.count[key] = 0
+            self.complete_in_24hrs[key] = 0
+
+        sketches = self.sketches[key]
+        for field, column in zip(self.fields, self._field_columns):
+            value = row[column]
+            # Steps not used by entity are not time stamped (NaN)
+            if value == value:
+                sketches[field].add(value - time_in)
+
+        self.count[key] += 1
+        completed = row[self._completed_column] - time_in
+        if completed <= self._params.day_duration:
+            self.complete_in_24hrs[key] += 1
+
+    def summarise(self, warm_up=None):
+        """Return summaries in the same form as the previous end-of-run
+        DataFrame summaries, for entities arriving from `warm_up` (minutes,
+        a whole number of days, up to `last_bucket` days; default
+        `cutoff`)."""
+
+        if warm_up is None:
+            warm_up = self.cutoff
+        first_day = int(warm_up // self._params.day_duration)
+
+        # Combine days after warm up
+        sketches = dict()
+        count = dict()
+        complete_in_24hrs = dict()
+        for (day, priority), day_sketches in self.sketches.items():
+            if day < first_day:
+                continue
+            if priority not in sketches:
+                sketches[priority] = {
+                    field: QuantileSketch() for field in self.fields}
+                count[priority] = 0
+                complete_in_24hrs[priority] = 0
+            for field in self.fields:
+                sketches[priority][field].merge(day_sketches[field])
+            count[priority] += self.count[(day, priority)]
+            complete_in_24hrs[priority] += \
+                self.complete_in_24hrs[(day, priority)]
+
+        priorities = sorted(sketches)
+
+        # Medians (all priorities)
+        medians = dict()
+        for field in self.fields:
+            sketch = QuantileSketch()
+            for priority in priorities:
+                sketch.merge(sketches[priority][field])
+            medians[field] = sketch.quantile(0.5)
+        time_stamp_medians = pd.Series(medians, name='median').round(0)
+
+        # Medians and 95th percentiles by priority
+        by_priority = dict()
+        for q, label in [(0.5, 'pct_50'), (0.95, 'pct_95')]:
+            records = [
+                {'process': field, 'priority': priority,
+                 'value': sketches[priority][field].quantile(q)}
+                for priority in priorities for field in self.fields]
+            df = pd.DataFrame(records,
+                              columns=['process', 'priority', 'value'])
+            df['value'] = df['value'].round(0)
+            df.set_index('process', inplace=True)
+            by_priority[label] = df
+
+        # Proportion complete in 24 hours, by priority and overall
+        total_count = sum(count.values())
+        total_complete = sum(complete_in_24hrs.values())
+        index = priorities + ['All']
+        values = [complete_in_24hrs[priority] / count[priority]
+                  for priority in priorities]
+        values.append(total_complete / total_count if total_count else 0.0)
+        complete_in_24hrs = pd.DataFrame(
+            {'complete_24_hrs': values},
+            index=pd.Index(index, name='priority'))
+
+        return (time_stamp_medians, by_priority['pct_50'],
+                by_priority['pct_95'], complete_in_24hrs)
@@ -1,61 +1,58 @@
-import random
-
 class Entity(object):
     """
     Entities (widgets, people, etc) handled by the simulation
-    
+
     Attributes
     ----------
-    _env: Refernce to SimPy environment object
-    _params: Reference to model paraemters
+    batch_id: id of delivery batch (int)
     batch_size: Quantitity of items in entitiy (float)
     entity_id: Entity ID number (int)
     entity_type: Description of entity (string)
+    last_queue: Name of last queue entered (string)
+    last_queue_time_in: Time entered last queue (float)
     parent_ids: IDs of parent entity (list)
-    process_step: Used to track process (int)
-    
+    priority: Entity priority (lower number -> higher priority) (float)
+    time_in: Time of arrival of original delivery batch (float)
+    time_stamp_row: Row of entity time stamps in time stamp store (int)
+
     Methods
     -------
     __init__
         Constructor method
-    
-    
+
+
     """
 
+    # Fixed attributes (no per-entity attribute dictionary)
+    __slots__ = ('batch_id', 'batch_size', 'entity_id', 'entity_type',
+                 'last_queue', 'last_queue_time_in', 'parent_ids', 'priority',
+                 'time_in', 'time_stamp_row')
+
     def __init__(self,
-                 _env=None,
-                 _params=None,
                  batch_id = 0,
                  batch_size = 1,
-                 completed_id=None,
                  entity_id = 0,
                  entity_type = 'generic',
                  last_queue = '',
                  last_queue_time_in = 0,
                  parent_ids = [],
-                 process_step = 0,
                  priority = 999,
-                 time_stamps = None,
                  time_in = 0,
-                 time_out = 0
+                 time_stamp_row = -1
                  ):
-        
+
         """
         Constructor method for entitiy
 
         Paramters
         ---------
-        _env : SimPy environment object
-            Reference tp SimPy environment object
-        _params: Model parameters object
-            Reference to model paraemters
         batch_id : int
             id of delivery batch
         batch_size : float
             Batch size (may be units or continuous variable, e.g. weight).
         entity_id : integer
             Entity ID
-        entity_type: string 
+        entity_type: string
             Description of entity
         last_queue: string
             Name of last queue entered
@@ -63,20 +60,21 @@ class Entity(object):
             Time entered last queue
         parent_ids : list
             List of any parent entities
-        process_step : int
-            Used to track process
+        priority : float
+            Entity priority (lower number -> higher priority)
+        time_in : float
+            Time of arrival of original delivery batch
+        time_stamp_row : int
+            Row of entity time stamps in time stamp store
 
         Returns
         -------
         None.
 
         """
-        
-        self._env = _env
-        self._params = _params
+
         self.batch_id = batch_id
         self.batch_size = batch_size
-        self.completed_id = completed_id
         self.entity_id = entity_id
         self.entity_type = entity_type
         self.last_queue = last_queue
@@ -84,5 +82,4 @@ class Entity(object):
         self.parent_ids = parent_ids
         self.priority = priority
         self.time_in = time_in
-        self.time_out = time_out
-        self.time_stamps = time_stamps
\ No newline at end of file
+        self.time_stamp_row = time_stamp_row
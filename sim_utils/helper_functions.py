@@ -1,5 +1,8 @@
 import inspect
-import pandas as pd
+import math
+
+import numpy as np
+
 
 def expand_multi_index(df, new_cols):
     """
@@ -34,4 +37,225 @@ def expand_multi_index(df, new_cols):
 
 def print_defaults(obj):
     lines = inspect.getsource(obj.__init__)
-    print(lines)
\ No newline at end of file
+    print(lines)
+
+
+def batch_means(values, min_batches=10, max_autocorrelation=0.2):
+    """
+    Non-overlapping batch means of a series from a single long run, with
+    automatic batch size. Starting from batches of one value, the batch size
+    is doubled while the lag-1 autocorrelation of the batch means is above
+    `max_autocorrelation`, as long as at least `min_batches` batches remain.
+    Values left over at the end of the series are not used.
+
+    Parameters
+    ----------
+    values : array-like
+        Output series (in time order, after warm up)
+    min_batches : int
+        Smallest number of batches
+    max_autocorrelation : float
+        Largest lag-1 autocorrelation of batch means accepted
+
+    Returns
+    -------
+    means : NumPy array
+        Batch means
+    batch_size : int
+        Values in each batch
+    autocorrelation : float
+        Lag-1 autocorrelation of batch means (if above `max_autocorrelation`
+        batch means are not independent, and a longer run is needed)
+
+    """
+
+    values = np.asarray(values, dtype=float)
+    batch_size = 1
+    while True:
+        batch_count = len(values) // batch_size
+        means = values[:batch_count * batch_size].reshape(
+            batch_count, batch_size).mean(axis=1)
+        autocorrelation = lag1_autocorrelation(means)
+        if (not autocorrelation > max_autocorrelation or
+                len(values) // (batch_size * 2) < min_batches):
+            return means, batch_size, autocorrelation
+        batch_size *= 2
+
+
+def confidence_interval(values, confidence=0.95):
+    """
+    Mean and confidence interval half-width of a sample (Student's t).
+
+    Parameters
+    ----------
+    values : array-like
+        Sample values (NaN values are ignored)
+    confidence : float
+        Confidence level (e.g. 0.95)
+
+    Returns
+    -------
+    mean : float
+        Sample mean
+    half_width : float
+        Confidence interval half-width (NaN if fewer than two values)
+
+    """
+
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    count = len(values)
+    if count == 0:
+        return np.nan, np.nan
+    mean = values.mean()
+    if count < 2:
+        return mean, np.nan
+    standard_error = values.std(ddof=1) / math.sqrt(count)
+    return mean, t_critical(confidence, count - 1) * standard_error
+
+
+def lag1_autocorrelation(values):
+    """Lag-1 autocorrelation of a series (NaN if fewer than three values; 0
+    if all values are equal)."""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 3:
+        return np.nan
+    deviations = values - values.mean()
+    sum_squares = np.sum(deviations ** 2)
+    if sum_squares == 0:
+        return 0.0
+    return np.sum(deviations[:-1] * deviations[1:]) / sum_squares
+
+
+def mser_truncation(values, max_fraction=0.5):
+    """
+    MSER truncation point of an output series: the number of initial values
+    to delete that minimises the marginal standard error,
+    sum((x_i - mean)^2) / (n - d)^2, of the values kept. The search is
+    limited to the first `max_fraction` of the series; a truncation point at
+    that limit suggests the series has not reached steady state.
+
+    MSER-5 applies this to means of batches of five values. Pass batch means
+    (e.g. daily means, which also remove a daily cycle) to do the same.
+
+    Parameters
+    ----------
+    values : array-like
+        Output series (in time order)
+    max_fraction : float
+        Largest fraction of the series that may be deleted
+
+    Returns
+    -------
+    int (number of initial values to delete)
+
+    """
+
+    values = np.asarray(values, dtype=float)
+    count = len(values)
+    max_delete = int(count * max_fraction)
+    if count < 2 or max_delete == 0:
+        return 0
+
+    # Sums of values kept for every truncation point at once
+    kept_sum = np.cumsum(values[::-1])[::-1][:max_delete + 1]
+    kept_squares = np.cumsum(values[::-1] ** 2)[::-1][:max_delete + 1]
+    kept = count - np.arange(max_delete + 1)
+    squared_deviations = np.maximum(kept_squares - kept_sum ** 2 / kept, 0.0)
+    return int(np.argmin(squared_deviations / kept ** 2))
+
+
+def regularized_incomplete_beta(x, a, b):
+    """
+    Regularized incomplete beta function I_x(a, b), by continued fraction
+    (Lentz's method).
+
+    Parameters
+    ----------
+    x : float
+        Upper limit of integration (0 - 1)
+    a, b : float
+        Shape parameters (> 0)
+
+    Returns
+    -------
+    float
+
+    """
+
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    # Continued fraction converges quickly for x < (a + 1) / (a + b + 2)
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - regularized_incomplete_beta(1 - x, b, a)
+
+    log_front = (math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                 a * math.log(x) + b * math.log(1 - x))
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 300):
+        # Even step
+        numerator = m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m))
+        d = 1.0 + numerator * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + numerator / c
+        c = c if abs(c) > tiny else tiny
+        fraction *= d * c
+        # Odd step
+        numerator = (-(a + m) * (a + b + m) * x /
+                     ((a + 2 * m) * (a + 2 * m + 1)))
+        d = 1.0 + numerator * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + numerator / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        fraction *= delta
+        if abs(delta - 1.0) < 1e-12:
+            break
+
+    return math.exp(log_front) * fraction / a
+
+
+def t_critical(confidence, degrees_of_freedom):
+    """
+    Two-sided critical value of Student's t distribution (e.g. 2.262 for 95%
+    confidence with 9 degrees of freedom).
+
+    Parameters
+    ----------
+    confidence : float
+        Confidence level (e.g. 0.95)
+    degrees_of_freedom : int
+        Degrees of freedom
+
+    Returns
+    -------
+    float
+
+    """
+
+    # Upper tail probability required
+    tail = (1 - confidence) / 2
+
+    def upper_tail(t):
+        x = degrees_of_freedom / (degrees_of_freedom + t * t)
+        return 0.5 * regularized_incomplete_beta(x, degrees_of_freedom / 2,
+                                                 0.5)
+
+    # Bisection (upper tail probability decreases as t increases)
+    low, high = 0.0, 1.0
+    while upper_tail(high) > tail:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if upper_tail(middle) > tail:
+            low = middle
+        else:
+            high = middle
+
+    return (low + high) / 2
@@ -1,5 +1,7 @@
 import simpy
 from sim_utils.process import Process
+from sim_utils.random_streams import RandomStreams
+from sim_utils.tracked_resource import TrackedResource
 
 
 class Model(object):
@@ -11,34 +13,61 @@ class Model(object):
     ----------
     _env: SimPy environment (object)
     _params: Model parameters (object)
+    _plan: Compiled, integer-indexed, model parameters (ScenarioPlan)
+    random_streams: Random number streams for each source of randomness
+        (RandomStreams)
+    seed: Seed entropy (int); passing this as seed reproduces the run (for a
+        resumed run, seed of random numbers used after warm up)
+    warm_up_seed: Seed entropy used in warm up (int)
     entities: List of all entities currently in model
     resources: Dictionary of resource objects, and numbers in model (dictionary)
-    resources_available: Current resources available (dictionary)
-    resources_occupied: Current resources occupied (dictionary)
-    workstation_assigned_jobs: Count of assigned jobs (dictionary)
-    workstation_queued_jobs: Count of queued jobs (dictionary)
+    resources_available: Current resources available, by resource id (list)
+    resources_occupied: Current resources occupied, by resource id (list)
+    workstation_assigned_jobs: Count of assigned jobs, by workstation id (list)
     
     Methods
     -------
     __init__
         Constructor method (sets up SimPy environment)
+
+    reseed
+        Replace random number streams with streams from a new seed
+
+    resume
+        Continue a warmed up model, with new random numbers, to end of run
+
+    run
+        Set up and run model
+
+    run_to_end
+        Run SimPy environment to end of run (or to steady state)
+
+    warm_up
+        Set up model and run to end of warm up (a snapshot that several runs
+        may be forked from, see replication.forked_run_records)
     
 
     """
     
     
-    def __init__(self, _params):
+    def __init__(self, _params, seed=None):
         """
-         Constructor method for SimPy model obejct.
+         Constructor method for SimPy model obejct. All random numbers are
+         derived from `seed` (None, an int, or a sequence of ints; None takes
+         fresh entropy from the operating system).
         """
         
         self._env = simpy.Environment()
         self._params = _params
+        self._plan = _params.compile_plan()
+        self.random_streams = RandomStreams(seed, self._plan.process_names)
+        self.seed = self.random_streams.seed
+        self.warm_up_seed = self.seed
         self.entities = []
         self.resources = dict()
-        self.resources_available = dict()
-        self.resources_occupied = dict()
-        self.workstation_assigned_jobs = dict()
+        self.resources_available = []
+        self.resources_occupied = []
+        self.workstation_assigned_jobs = []
         
    
     def run(self):
@@ -50,13 +79,67 @@ class Model(object):
             * Set up starting processes
             * Run model        
         """
-        
+
+        self.set_up()
+        self.run_to_end()
+        self.process.end_run_routine()
+
+    def warm_up(self):
+        """Set up model and run to the end of warm up. Model state can then be
+        copied (e.g. by forking the process) and each copy resumed."""
+
+        self.set_up()
+        warm_up_length = self._params.day_duration * self._params.warm_up_days
+        if warm_up_length > 0:
+            self._env.run(warm_up_length)
+
+    def resume(self, seed=None):
+        """Continue a warmed up model to the end of the run, taking random
+        numbers after warm up from `seed`."""
+
+        self.reseed(seed)
+        self.run_to_end()
+        self.process.end_run_routine()
+
+    def reseed(self, seed=None):
+        """Replace random number streams with streams from `seed`. Events
+        already scheduled (e.g. break and breakdown times) are unchanged."""
+
+        self.random_streams = RandomStreams(seed, self._plan.process_names)
+        self.seed = self.random_streams.seed
+        self.process.random_streams = self.random_streams
+        self.process.process_steps.set_random_streams(self.random_streams)
+
+    def run_to_end(self):
+        """Run SimPy environment to end of run. With `stop_at_steady_state`
+        the model runs a day at a time, and stops early once steady state
+        results have been collected."""
+
+        if not (self._params.stop_at_steady_state and
+                self._params.warm_up_mode == 'mser'):
+            self._env.run(self._params.run_length)
+            return
+
+        day_duration = self._params.day_duration
+        day = int(self._env.now // day_duration) + 1
+        while day * day_duration <= self._params.run_length:
+            self._env.run(day * day_duration)
+            if self.process.audit.steady_state_reached():
+                break
+            day += 1
+
+    def set_up(self):
+        """Set up resources, workstations, processes and audit, and start
+        model processes (ready for the SimPy environment to run)."""
+
         # Set up resources and workstations        
         self.set_up_resources()
         self.set_up_workstations()
     
         # Set up processes and audit
         self.set_up_process()
+        self.process.set_up_resource_allocator()
+        self.process.set_up_roster()
         self.process.set_up_process_steps()
         self.process.set_up_audit()
         
@@ -64,24 +147,24 @@ class Model(object):
         # Initialise processes that will run on model run
         self._env.process(self.process.process_steps.generate_breakdowns())
         self._env.process(self.process.control_process())
+        self._env.process(self.process.roster.run())
+        if self._params.dispatch_mode == 'event':
+            self._env.process(self.process.process_start_changes())
         self._env.process(self.process.display_day())
         self._env.process(self.process.audit.run_audit())
+        self._env.process(self.process.audit.run_daily_statistics())
         self.process.set_up_breaks()
         for delivery_time in self._params.delivery_times:
             self._env.process(self.process.process_steps.generate_input(
                 delivery_time * 60))
-
-        # Run
-        self._env.run(self._params.run_length)
-
-        # End of run
-        self.process.end_run_routine()
         
         
         
     def set_up_process(self):
         self.process = Process(self._env, 
                                self._params, 
+                               self._plan,
+                               self.random_streams,
                                self.resources,
                                self.resources_available,
                                self.resources_occupied, 
@@ -91,25 +174,28 @@ class Model(object):
     def set_up_resources(self):
         """
         Set up:
-        self.resources: A dictionary of resource objects
-        self.resources_available: A dictionary of count of resources available
-        self.resources_occupied: A dictionary of count of resources occupied
+        self.resources: A dictionary of resource objects (TrackedResource)
+        self.resources_available: A list of count of resources available
+        self.resources_occupied: A list of count of resources occupied
         """
         # Set up resources
-        for key, value in self._params.resource_numbers.items():
+        on_shift = self._plan.resource_timetable[:, 0].tolist()
+        for key, value, starts_on_shift in zip(
+                self._plan.resource_names,
+                self._plan.resource_numbers.tolist(), on_shift):
             # Store resource objects in a dictionary
-            # Set up dictionaries of available and occupied
-            self.resources_available[key] = value
-            self.resources_occupied[key] = 0
+            # Set up lists (by resource id) of available and occupied
+            self.resources_available.append(value)
+            self.resources_occupied.append(0)
             if value > 0:
-                self.resources[key] = simpy.PriorityResource(
-                    self._env, capacity=value)
+                self.resources[key] = TrackedResource(
+                    self._env, capacity=value, on_shift=starts_on_shift)
 
             
             
     def set_up_workstations(self):
         """
-        Set up dictionaries for counts of assigned jobs and queued jobs for each
+        Set up list (by workstation id) for counts of assigned jobs for each
         workstation. """
-        for key, _ in self._params.workstation_capacity.items():
-            self.workstation_assigned_jobs[key] = 0
\ No newline at end of file
+        for _workstation in self._plan.workstation_names:
+            self.workstation_assigned_jobs.append(0)
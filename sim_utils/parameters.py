@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+from sim_utils.plan import ScenarioPlan
 
 class Scenario(object):
     """
@@ -27,6 +28,17 @@ class Scenario(object):
         self.run_days = 2
         self.warm_up_days = 2
 
+        # Warm up mode:
+        # 'fixed' ignores results from the first warm_up_days;
+        # 'mser' audits from time zero and, at the end of the run, chooses the
+        # number of warm up days to ignore (MSER on daily audit series). The
+        # run is then warm_up_days + run_days long, and any of it may be used
+        # for results.
+        self.warm_up_mode = 'fixed'
+        # In 'mser' mode, end the run once steady state is found and run_days
+        # of results after warm up have been collected
+        self.stop_at_steady_state = False
+
         # Breaks for people (high priority job, but does not interrupt work)
         # Times from start of FTE day (6am)
         self.tea_break_times = [2*60, 16*60, 18*60]
@@ -40,6 +52,13 @@ class Scenario(object):
 
         # Audit parameters
         self.audit_interval = 15
+        # Record queue lengths at each audit (Audit.queue_audit). Not needed
+        # for results: queues track exact queue statistics.
+        self.audit_queue_lengths = False
+        # Record resources in use at each audit (Audit.resource_audit), for
+        # diagnostics. Not needed for results: resource utilisation and
+        # trackers are tracked exactly.
+        self.audit_resource_use = False
 
         # Resource numbers        
         self.resource_numbers = {
@@ -81,6 +100,11 @@ class Scenario(object):
             'transfer': 99
         }
 
+        # Number of days in resource roster (e.g. 7 for weekday/weekend
+        # patterns). Resource shift hours may be a (start, end) tuple used
+        # every day, or a list of (start, end) tuples, one per roster day.
+        self.roster_days = 1
+
         # Resource available hours (use hours)
         self.resource_shift_hours = {
             'human_sample_preprocess_1': (0.00, 9.00),
@@ -213,6 +237,11 @@ class Scenario(object):
             'transfer_1': 10
         }
 
+        # Dispatch mode for assigning queued jobs to process steps:
+        # 'event' runs a dispatch pass only when a queue, resource or shift
+        # changes; 'poll' runs a dispatch pass every minute
+        self.dispatch_mode = 'event'
+
         # Process resources = tuple of different resources needed and lists of
         # alternatives. Remember to put , after a single list to maintain tuple
         # format! tuple of two or more elements will require resources from each
@@ -388,16 +417,11 @@ class Scenario(object):
                 self.basic_batch_size)
         self.delivery_batch_sizes = list(self.delivery_batch_sizes.values)
 
-        # Set warm up and run length
-        self.audit_warm_up = self.day_duration * self.warm_up_days
-        self.run_length = self.run_days * self.day_duration + self.audit_warm_up
-
         # Sort priority dictionary by value
         self.process_priorities = {key: value for key, value in sorted(
             self.process_priorities.items(), key=lambda item: item[1])}
 
-        # Set up kanban group counts and dictionaries for start.end
-        self.kanban_group_counts = dict()
+        # Set up kanban group maximums and dictionaries for start.end
         self.kanban_group_max = dict()
         self.kanban_start = dict()
         self.kanban_end = dict()
@@ -415,12 +439,12 @@ class Scenario(object):
                 self.kanban_start[value[0]].append(key)
                 self.kanban_end[value[1]].append(key)
 
-            # Set up kanban group counts
+            # Set up kanban group maximums (counts are held in the model)
             for key, value in self.kanban_groups.items():
-                self.kanban_group_counts[key] = 0
                 self.kanban_group_max[key] = value[2]
 
-        # Add tracker resources
+        # Add trackers (counters of jobs and FTE in process steps, see
+        # Trackers; not SimPy resources)
         tracker_resource_numbers = {
             'tracker_all_jobs_fte': 1000,
             'tracker_data_analysis_fte': 1000,
@@ -494,8 +518,42 @@ class Scenario(object):
         self.resource_breakdown_unavailability.update(tracker_unavailability)
 
         # Convert resource shifts to minutes, and place in new dictionary
+        # (a list of shifts for each roster day, or a single shift every day)
         self.resource_shifts = dict()
         for resource, shift_hours in self.resource_shift_hours.items():
-            start = shift_hours[0] * 60
-            end = shift_hours[1] * 60
-            self.resource_shifts[resource] = (start, end)
+            if isinstance(shift_hours, list):
+                self.resource_shifts[resource] = [
+                    (day_shift[0] * 60, day_shift[1] * 60) for day_shift in
+                    shift_hours]
+            else:
+                start = shift_hours[0] * 60
+                end = shift_hours[1] * 60
+                self.resource_shifts[resource] = (start, end)
+
+    @property
+    def audit_warm_up(self):
+        """Warm up (minutes) before which results are ignored ('fixed' warm up
+        mode)"""
+        return self.day_duration * self.warm_up_days
+
+    @property
+    def result_days(self):
+        """Maximum number of days of results"""
+        if self.warm_up_mode == 'mser':
+            return self.run_days + self.warm_up_days
+        return self.run_days
+
+    @property
+    def run_length(self):
+        """Run length (minutes) including warm up"""
+        return self.run_days * self.day_duration + self.audit_warm_up
+
+    def set_run_days(self, run_days):
+        """Set number of days run after warm up (run length and maximum days
+        of results follow from it)."""
+        self.run_days = run_days
+
+    def compile_plan(self):
+        """Compile scenario into an immutable, integer-indexed ScenarioPlan
+        (made once per model run)."""
+        return ScenarioPlan(self)
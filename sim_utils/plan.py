@@ -0,0 +1,262 @@
+from types import MappingProxyType
+
+import numpy as np
+
+# Queues used by the model (fixed by model structure)
+QUEUE_NAMES = (
+    'q_batch_input',
+    'q_data_analysis',
+    'q_heat',
+    'q_heat_collation',
+    'q_heat_split',
+    'q_pcr',
+    'q_pcr_collation',
+    'q_pcr_prep',
+    'q_rna_collation',
+    'q_rna_extraction',
+    'q_rna_extraction_split',
+    'q_sample_preprocess',
+    'q_sample_receipt',
+    'q_sample_prep',
+    'q_transfer_1',
+    'q_transfer_1_collation',
+    'q_transfer_1_split',
+)
+
+# Tracker counting staff (FTE) on break
+BREAK_TRACKER = 'tracker_break_fte'
+
+
+def _ids(names):
+    """Read-only dictionary of name -> dense integer id"""
+    return MappingProxyType({name: i for i, name in enumerate(names)})
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+def _freeze(value):
+    """Convert dictionaries (including nested) to read-only mappings, and
+    make arrays read-only"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in
+                                 value.items()})
+    if isinstance(value, np.ndarray):
+        return _read_only(value)
+    return value
+
+
+def _thaw(value):
+    """Convert read-only mappings (including nested) to dictionaries (for
+    pickling)"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+class ScenarioPlan:
+    """
+    Immutable, integer-indexed compilation of a Scenario, made once per model
+    run. Each resource, queue, workstation, process and kanban group has a
+    dense integer id, and counts, capacities and shift windows are held in
+    NumPy arrays indexed by id. Model code on per-minute and per-job paths
+    uses these ids (and list copies of the tables) instead of looking up
+    string-keyed dictionaries.
+
+    Attributes
+    ----------
+    kanban_ids: Kanban group key -> id (mapping)
+    kanban_max: Maximum samples in kanban group, by kanban id (array)
+    kanban_end: Kanban ids ended by each process, by process id (tuple)
+    kanban_start: Kanban ids started by each process, by process id (tuple)
+    process_ids: Process name -> id (mapping)
+    process_intervals: Minutes between assignment checks, by process id
+        (array)
+    process_names: Process names, by process id (tuple)
+    process_resources: Process name -> resource groups as tuples of resource
+        ids, for 'human_list' and 'machine_list', and tracker ids counted
+        while those resources are held, for 'human_trackers' and
+        'machine_trackers' (mapping)
+    process_workstations: Workstation ids for each process, by process id
+        (tuple)
+    queue_ids: Queue name -> id (mapping)
+    queue_names: Queue names, by queue id (tuple)
+    queue_units: Samples in each item of each queue, by queue id (array)
+    resource_ids: Resource name -> id (mapping)
+    resource_names: Resource names, by resource id (tuple)
+    resource_numbers: Number of each resource, by resource id (array)
+    resource_timetable: Whether resource is on shift in each minute of the
+        roster, by resource id (boolean array, shape resources x
+        roster_minutes)
+    roster_minutes: Length of resource roster (minutes)
+    shift_change_minutes: Minutes in roster when any resource starts or ends
+        a shift (array)
+    tracker_ids: Tracker name -> id (mapping)
+    tracker_names: Tracker names, by tracker id (tuple)
+    workstation_capacity: Workstation capacity, by workstation id (array)
+    workstation_ids: Workstation name -> id (mapping)
+    workstation_names: Workstation names, by workstation id (tuple)
+
+    """
+
+    def __init__(self, _params):
+        """
+        Constructor method for plan
+
+        Parameters
+        ----------
+        _params : Scenario
+            Scenario parameters to compile
+
+        Returns
+        -------
+        None.
+
+        """
+
+        # Resources ('tracker_*' entries are counters, not resources)
+        resource_names = tuple(name for name in _params.resource_numbers
+                               if name[0:7] != 'tracker')
+        resource_ids = _ids(resource_names)
+        self._set('resource_names', resource_names)
+        self._set('resource_ids', resource_ids)
+        self._set('resource_numbers', _read_only(np.array(
+            [_params.resource_numbers[name] for name in resource_names],
+            dtype=np.int64)))
+
+        # Resource timetable (on-shift bitmap for each minute of the roster).
+        # A minute is on-shift if it starts within the shift.
+        day_duration = int(_params.day_duration)
+        roster_days = _params.roster_days
+        minutes = np.arange(day_duration)
+        timetable = np.zeros((len(resource_names), roster_days * day_duration),
+                             dtype=bool)
+        for resource_id, name in enumerate(resource_names):
+            shifts = _params.resource_shifts[name]
+            if not isinstance(shifts, list):
+                shifts = [shifts] * roster_days
+            if len(shifts) != roster_days:
+                raise ValueError(f'Resource {name} has {len(shifts)} shifts '
+                                 f'for a {roster_days} day roster')
+            for day, shift in enumerate(shifts):
+                on_shift = (minutes >= shift[0]) & (minutes < shift[1])
+                timetable[resource_id, day * day_duration:
+                          (day + 1) * day_duration] = on_shift
+        self._set('resource_timetable', _read_only(timetable))
+        self._set('roster_minutes', roster_days * day_duration)
+
+        # Minutes at which any resource shift starts or ends
+        changes = np.any(timetable != np.roll(timetable, 1, axis=1), axis=0)
+        self._set('shift_change_minutes', _read_only(np.flatnonzero(changes)))
+
+        # Queues
+        self._set('queue_names', QUEUE_NAMES)
+        self._set('queue_ids', _ids(QUEUE_NAMES))
+
+        # Samples in each queued item. Entity batch sizes are not sample
+        # counts after collation and splitting, so units follow the
+        # collation and split sizes. Arrival batches are not counted.
+        basic = _params.basic_batch_size
+        queue_units = {
+            'q_batch_input': 0,
+            'q_data_analysis': basic * 4,
+            'q_heat': basic * _params.heat_batch_size,
+            'q_heat_collation': basic,
+            'q_heat_split': basic * _params.heat_batch_size,
+            'q_pcr': basic * 4,
+            'q_pcr_collation': basic,
+            'q_pcr_prep': basic * 4,
+            'q_rna_collation': basic,
+            'q_rna_extraction': basic * _params.rna_extraction_batch_size,
+            'q_rna_extraction_split':
+                basic * _params.rna_extraction_batch_size,
+            'q_sample_preprocess': basic,
+            'q_sample_receipt': basic,
+            'q_sample_prep': basic,
+            'q_transfer_1': basic * _params.transfer_1_batch_size,
+            'q_transfer_1_collation': basic,
+            'q_transfer_1_split': basic * _params.transfer_1_batch_size,
+        }
+        self._set('queue_units', _read_only(np.array(
+            [queue_units[name] for name in QUEUE_NAMES], dtype=np.int64)))
+
+        # Workstations
+        workstation_names = tuple(_params.workstation_capacity.keys())
+        workstation_ids = _ids(workstation_names)
+        self._set('workstation_names', workstation_names)
+        self._set('workstation_ids', workstation_ids)
+        self._set('workstation_capacity', _read_only(np.array(
+            [_params.workstation_capacity[name] for name in
+             workstation_names], dtype=np.int64)))
+
+        # Processes
+        process_names = tuple(_params.process_duration.keys())
+        self._set('process_names', process_names)
+        self._set('process_ids', _ids(process_names))
+        self._set('process_intervals', _read_only(np.array(
+            [_params.process_intervals.get(name, 1) for name in
+             process_names], dtype=np.int64)))
+        self._set('process_workstations', tuple(
+            tuple(workstation_ids[workstation] for workstation in
+                  _params.process_workstations.get(name, []))
+            for name in process_names))
+
+        # Trackers
+        tracker_names = tuple(name for name in _params.resource_numbers
+                              if name[0:7] == 'tracker') + (BREAK_TRACKER,)
+        tracker_ids = _ids(tracker_names)
+        self._set('tracker_names', tracker_names)
+        self._set('tracker_ids', tracker_ids)
+
+        # Process resource groups. Groups of trackers are always available,
+        # so the first tracker of the group is counted instead. Empty groups
+        # (e.g. `([],)` for no machine) need no resource and are dropped, as
+        # the allocator could never satisfy them.
+        process_resources = dict()
+        for process, resources in _params.process_resources.items():
+            compiled = dict()
+            for key, tracker_key in (('human_list', 'human_trackers'),
+                                     ('machine_list', 'machine_trackers')):
+                groups = []
+                trackers = []
+                for group in resources[key]:
+                    if not group:
+                        continue
+                    if group[0][0:7] == 'tracker':
+                        trackers.append(tracker_ids[group[0]])
+                    else:
+                        groups.append(tuple(resource_ids[resource]
+                                            for resource in group))
+                compiled[key] = tuple(groups)
+                compiled[tracker_key] = tuple(trackers)
+            process_resources[process] = MappingProxyType(compiled)
+        self._set('process_resources', MappingProxyType(process_resources))
+
+        # Kanban groups
+        kanban_keys = tuple(_params.kanban_groups.keys())
+        kanban_ids = _ids(kanban_keys)
+        self._set('kanban_ids', kanban_ids)
+        self._set('kanban_max', _read_only(np.array(
+            [_params.kanban_groups[key][2] for key in kanban_keys],
+            dtype=np.int64)))
+        self._set('kanban_start', tuple(
+            tuple(kanban_ids[key] for key in _params.kanban_start[name])
+            for name in process_names))
+        self._set('kanban_end', tuple(
+            tuple(kanban_ids[key] for key in _params.kanban_end[name])
+            for name in process_names))
+
+    def __getstate__(self):
+        return {name: _thaw(value) for name, value in self.__dict__.items()}
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ScenarioPlan is immutable')
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            self._set(name, _freeze(value))
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
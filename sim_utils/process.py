@@ -1,8 +1,12 @@
-import numpy as np
-import pandas as pd
-import queue
 from sim_utils.process_steps import ProcessSteps
 from sim_utils.audit import Audit
+from sim_utils.completion_sink import CompletionSink
+from sim_utils.quantile_sketch import QuantileSketch
+from sim_utils.resource_allocator import ResourceAllocator
+from sim_utils.roster import Roster
+from sim_utils.sim_queue import SimQueue
+from sim_utils.time_stamps import TimeStampStore
+from sim_utils.trackers import Trackers
 
 
 class Process:
@@ -12,67 +16,91 @@ class Process:
     Parameters
     ----------
     batch_id_count: count of unique delivery batch ids (integer)
+    completion_sink: aggregation of completed entities (CompletionSink)
     id_count: count of unique ids (integer)
+    kanban_group_counts: current samples in kanban group, by kanban id (list)
     parent_child = child ids for each parent id (dictionary)
+    random_streams: random number streams for model run (RandomStreams)
+    time_stamps: entity time stamps (TimeStampStore)
+    trackers: counts of jobs and staff in process steps (Trackers)
+
+    In 'event' dispatch mode the control process sleeps until a dispatch pass
+    is requested (queue put, resource release, shift boundary, or a process
+    interval falling due). In 'poll' mode a dispatch pass runs every minute.
  
     """
 
-    def __init__(self, _env, _params, resources, resources_available,
-                 resources_occupied, workstation_assigned_jobs):
+    def __init__(self, _env, _params, _plan, random_streams, resources,
+                 resources_available, resources_occupied,
+                 workstation_assigned_jobs):
 
         self._env = _env
         self._params = _params
+        self._plan = _plan
+        self.random_streams = random_streams
         self.batch_id_count = 0
         self.parent_child = dict()
         self.id_count = 0
-        self.fte_on_break = [0]
         self.count_in = []
         self.count_out = []
         self.resources = resources
         self.resources_available = resources_available
         self.resources_occupied = resources_occupied
         self.workstation_assigned_jobs = workstation_assigned_jobs
+        self.kanban_group_counts = [0] * len(_plan.kanban_max)
+
+        # Resource objects by resource id (None if no resources)
+        self.resource_list = [resources.get(name) for name in
+                              _plan.resource_names]
+
+        # Whether resource is currently on shift, by resource id (updated by
+        # roster at shift changes)
+        self.resources_on_shift = _plan.resource_timetable[:, 0].tolist()
+
+        # Tables (by id) used when assigning jobs
+        self._kanban_max = _plan.kanban_max.tolist()
+        self._process_intervals = _plan.process_intervals.tolist()
+        self._workstation_capacity = _plan.workstation_capacity.tolist()
+
+        # Event dispatch state
+        self._dispatch_pending = False
+        self._dispatch_trigger = None
+        self._next_timed_dispatch = None
 
         # Queues for assignment
-        self.queues = {
-            'q_batch_input': queue.PriorityQueue(),
-            'q_completed': queue.PriorityQueue(),
-            'q_data_analysis': queue.PriorityQueue(),
-            'q_heat': queue.PriorityQueue(),
-            'q_heat_collation': queue.PriorityQueue(),
-            'q_heat_split': queue.PriorityQueue(),
-            'q_pcr': queue.PriorityQueue(),
-            'q_pcr_collation': queue.PriorityQueue(),
-            'q_pcr_prep': queue.PriorityQueue(),
-            'q_rna_collation': queue.PriorityQueue(),
-            'q_rna_extraction': queue.PriorityQueue(),
-            'q_rna_extraction_split': queue.PriorityQueue(),
-            'q_sample_preprocess': queue.PriorityQueue(),
-            'q_sample_receipt': queue.PriorityQueue(),
-            'q_sample_prep': queue.PriorityQueue(),
-            'q_transfer_1': queue.PriorityQueue(),
-            'q_transfer_1_collation': queue.PriorityQueue(),
-            'q_transfer_1_split': queue.PriorityQueue(),
-        }
+        self.queues = {name: SimQueue(_env, units) for name, units in
+                       zip(_plan.queue_names, _plan.queue_units.tolist())}
+
+        # Entity time stamps (one row per entity in model)
+        time_stamp_columns = ['time_in', 'time_in_batched']
+        for name in _plan.process_names:
+            time_stamp_columns += [name + '_in', name + '_out']
+        self.time_stamps = TimeStampStore(time_stamp_columns)
+
+        # Aggregation of completed entities
+        self.completion_sink = CompletionSink(self)
 
-        # Queue monitor (lists of time/time out tuples)
+        # Counters of jobs and staff in process steps, and staff on break
+        self.trackers = Trackers(self)
+
+        # Queue monitors (quantile sketch of times in each queue)
         self.queue_monitors = {
-            'q_data_analysis': [],
-            'q_heat': [],
-            'q_heat_collation': [],
-            'q_heat_split': [],
-            'q_pcr': [],
-            'q_pcr_collation': [],
-            'q_pcr_prep': [],
-            'q_rna_collation': [],
-            'q_rna_extraction': [],
-            'q_rna_extraction_split': [],
-            'q_sample_prep': [],
-            'q_sample_preprocess': [],
-            'q_sample_receipt': [],
-            'q_transfer_1': [],
-            'q_transfer_1_collation': [],
-            'q_transfer_1_split': []
+            'q_data_analysis': QuantileSketch(),
+            'q_heat': QuantileSketch(),
+            'q_heat_collation': QuantileSketch(),
+            'q_heat_split': QuantileSketch(),
+            'q_pcr': QuantileSketch(),
+            'q_pcr_collation': QuantileSketch(),
+            'q_pcr_prep': QuantileSketch(),
+            'q_rna_collation': QuantileSketch(),
+            'q_rna_extraction': QuantileSketch(),
+            'q_rna_extraction_split': QuantileSketch(),
+            'q_sample_prep': QuantileSketch(),
+            'q_sample_preprocess': QuantileSketch(),
+            'q_sample_receipt': QuantileSketch(),
+            'q_transfer_1': QuantileSketch(),
+            'q_transfer_1_collation': QuantileSketch(),
+            'q_transfer_1_split': QuantileSketch()
         }
 
         # Process step counters
@@ -105,33 +133,32 @@ class Process:
 
     def assign(self, queue, process):
 
+        process_id = self._plan.process_ids[process]
+        queue = self.queues[queue]
+
         # Check process intervals
-        interval = (self._params.process_intervals[process] if process in
-                                                               self._params.process_intervals else 1)
-        if int(self._env.now) % interval != 0:
+        interval = self._process_intervals[process_id]
+        since_due = int(self._env.now) % interval
+        if interval > 1 and since_due != 0:
+            if not queue.empty():
+                # Make sure a dispatch pass runs when interval is next due
+                self.schedule_dispatch(interval - since_due)
             return
 
         process_func = self.process_steps.process_step_funcs[process]
-        # Assign sample_receipts
-        new_unallocated_queue = []
+        relevant_kanban_groups = self._plan.kanban_start[process_id]
 
-        while not self.queues[queue].empty():
+        while not queue.empty():
             # Check kanban limits
-            # Get job size by getting next item, inspecting and replacing
-            priority, next_job = self.queues[queue].get()
-            job_size = next_job.batch_size
-            self.queues[queue].put((priority, next_job))
-            relevant_kanban_groups = self._params.kanban_start[process]
             if len(relevant_kanban_groups) > 0:
+                # Get job size by inspecting next item
+                job_size = queue.peek()[1].batch_size
                 # Check any relavant kanban group limits are OK
                 all_kanban_limts_ok = True
                 for kanban_group in relevant_kanban_groups:
-                    current_kanban_count = \
-                        self._params.kanban_group_counts[kanban_group]
-                    kanban_capacity = \
-                        self._params.kanban_group_max[kanban_group]
-                    spare_kanban_capacity = \
-                        kanban_capacity - current_kanban_count
+                    spare_kanban_capacity = (
+                        self._kanban_max[kanban_group] -
+                        self.kanban_group_counts[kanban_group])
                     if spare_kanban_capacity < job_size:
                         all_kanban_limts_ok = False
                 # if at least one kanban limit breached break loop
@@ -141,20 +168,16 @@ class Process:
                 else:
                     # Adjust kanban group counts
                     for kanban_group in relevant_kanban_groups:
-                        self._params.kanban_group_counts[kanban_group] += \
-                            job_size
+                        self.kanban_group_counts[kanban_group] += job_size
 
             # All relevant kanban limits OK -  proceed to assign job
-            job = self.queues[queue].get()[1]
-            workstation = self.identify_workstation(process)
-            if workstation != 'none':
-                process_func(workstation, job)
-                self.workstation_assigned_jobs[workstation] += 1
-            else:
-                # Process workstations full, replace job and stop loop
-                item = (job.priority, job)
-                self.queues[queue].put(item)
+            workstation = self.identify_workstation(process_id)
+            if workstation < 0:
+                # Process workstations full, leave job queued and stop loop
                 break
+            job = queue.get()[1]
+            process_func(workstation, job)
+            self.workstation_assigned_jobs[workstation] += 1
 
     def assign_analysis(self, time_of_day, time_left):
         # pass any new input to process_step.batch_input
@@ -258,26 +281,45 @@ class Process:
     def control_process(self):
         yield self._env.timeout(5)
         while True:
-            # Assign jobs from later -> earlier (enhances flow)
-
-            time_of_day = self._env.now % self._params.day_duration
-            time_left = self._params.day_duration - time_of_day
-
-            # Model admin jobs (no resources needed)
-            self.assign_batch_input()
-            self.collate_for_pcr()
-            self.collate_for_rna_extraction()
-            self.split_after_rna_extraction()
-            self.collate_for_transfer_1()
-            self.split_after_transfer_1()
-            self.collate_for_heat()
-            self.split_after_heat()
-
-            for key in self._params.process_priorities.keys():
-                self.process_assign_calls[key](time_of_day, time_left)
-
-            # Time before next control loop
-            yield self._env.timeout(1.0)
+            self._dispatch_pending = False
+            self.dispatch()
+
+            if self._params.dispatch_mode == 'poll':
+                # Time before next control loop
+                yield self._env.timeout(1.0)
+
+            elif not self._dispatch_pending:
+                # Sleep until a dispatch pass is requested (if admin steps
+                # requested one during this pass, loop again straight away)
+                self._dispatch_trigger = self._env.event()
+                wake_events = [self._dispatch_trigger]
+                if self._next_timed_dispatch is not None:
+                    wake_events.append(self._env.timeout(
+                        self._next_timed_dispatch - self._env.now))
+                    self._next_timed_dispatch = None
+                yield self._env.any_of(wake_events)
+
+    def dispatch(self):
+        """Single dispatch pass: run admin steps and assign jobs from queues
+        to process steps."""
+
+        # Assign jobs from later -> earlier (enhances flow)
+
+        time_of_day = self._env.now % self._params.day_duration
+        time_left = self._params.day_duration - time_of_day
+
+        # Model admin jobs (no resources needed)
+        self.assign_batch_input()
+        self.collate_for_pcr()
+        self.collate_for_rna_extraction()
+        self.split_after_rna_extraction()
+        self.collate_for_transfer_1()
+        self.split_after_transfer_1()
+        self.collate_for_heat()
+        self.split_after_heat()
+
+        for key in self._params.process_priorities.keys():
+            self.process_assign_calls[key](time_of_day, time_left)
 
     def display_day(self):
         while True:
@@ -286,27 +328,28 @@ class Process:
             yield self._env.timeout(self._params.day_duration)
 
     def end_run_routine(self):
+        self.audit.set_warm_up()
         self.audit.summarise_in_out()
         self.audit.summarise_resources_with_shifts()
         self.audit.summarise_queues()
+        self.audit.summarise_queue_lengths()
         self.audit.summarise_queue_times()
         self.audit.summarise_trackers()
         self.process_completed()
 
-    def identify_workstation(self, process):
+    def identify_workstation(self, process_id):
         """
         Loops through workstations that can perform a process. Looks for 
         workstation with greatest remaining capacity. If no workstation has
-        capapcity, returns 'none'
+        capapcity, returns -1 (otherwise returns workstation id)
         """
 
-        selected_workstation = 'none'
+        selected_workstation = -1
         best_remaining_capacity = 0
 
-        workstations = self._params.process_workstations[process]
+        workstations = self._plan.process_workstations[process_id]
         for workstation in workstations:
-            workstation_capacity = \
-                self._params.workstation_capacity[workstation]
+            workstation_capacity = self._workstation_capacity[workstation]
             workstation_assigned = self.workstation_assigned_jobs[workstation]
             remaining_capacity = workstation_capacity - workstation_assigned
             if remaining_capacity > best_remaining_capacity:
@@ -316,108 +359,29 @@ class Process:
         return selected_workstation
 
     def process_completed(self):
-
-        processed_entities = []
-
-        keys = [
-            'time_in',
-            'sample_preprocess_in',
-            'sample_preprocess_out',
-            'sample_receipt_in',
-            'sample_receipt_out',
-            'sample_prep_auto_in',
-            'sample_prep_auto_out',
-            'sample_prep_manual_in',
-            'sample_prep_manual_out',
-            'sample_heat_in',
-            'sample_heat_out',
-            'rna_extraction_in',
-            'rna_extraction_out',
-            'pcr_prep_in',
-            'pcr_prep_out',
-            'pcr_in',
-            'pcr_out',
-            'data_analysis_in',
-            'data_analysis_out'
-        ]
-
-        # Calculate time from time in
-        while not self.process_steps._queues['q_completed'].empty():
-            ent = self.process_steps._queues['q_completed'].get()[1]
-            new_ent = dict()
-            for key in keys:
-                try:
-                    new_ent[key] = ent.time_stamps[key] - ent.time_stamps['time_in']
-                except:
-                    new_ent[key] = None
-            # Add back original time in
-            new_ent['time_in'] = ent.time_stamps['time_in']
-            new_ent['priority'] = int(ent.priority/100) + 1
-            processed_entities.append(new_ent)
-
-        keys.append('priority')
-        self.time_stamp_df = pd.DataFrame(processed_entities, columns=keys)
-
-        # Get median values for key time points
-        fields = ['sample_preprocess_in', 'sample_preprocess_out',
-                  'sample_receipt_in', 'sample_receipt_out',
-                  'sample_prep_auto_in', 'sample_prep_auto_out',
-                  'sample_prep_manual_in', 'sample_prep_manual_out',
-                  'sample_heat_in', 'sample_heat_out',
-                  'rna_extraction_in', 'rna_extraction_out',
-                  'pcr_prep_in', 'pcr_prep_out',
-                  'pcr_in', 'pcr_out',
-                  'data_analysis_in', 'data_analysis_out']
-
-        # Restrict time stamps to after warm up
-        cutoff = self._params.day_duration * self._params.warm_up_days
-        mask = self.time_stamp_df['time_in'] >= cutoff
-        self.time_stamp_df = self.time_stamp_df[mask]
-
-        # Get summary
-        df_summary = self.time_stamp_df.describe().T['50%']
-
-        # Limit fields to those present in dataframe
-        df_items = list(df_summary.index)
-        fields = [f for f in fields if f in df_items]
-
-        df_summary = df_summary.loc[fields]
-        df_summary = df_summary.round(0)
-        df_summary.rename('median', inplace=True)
-        self.audit.time_stamp_medians = df_summary
-
-        # Restrict time stamp data to those with numeric data
-        keep = list(self.time_stamp_df.count(numeric_only=True).index)
-        self.time_stamp_df = self.time_stamp_df[keep]
-
-        # Get medians and 95 percentiles by priority
-        medians = self.time_stamp_df.groupby(['priority']).median()
-        medians = medians[fields].T.round(0)
-        medians['process'] = medians.index
-        medians = medians.melt(id_vars='process')
-        medians.set_index('process', inplace=True)
-        self.audit.time_stamp_by_priority_pct_50 = medians
-
-        pct_95 = self.time_stamp_df.groupby(['priority']).quantile(0.95)
-        pct_95 = pct_95[fields].T.round(0)
-        pct_95['process'] = pct_95.index
-        pct_95 = pct_95.melt(id_vars='process')
-        pct_95.set_index('process', inplace=True)
-        self.audit.time_stamp_by_priority_pct_95 = pct_95
-
-        # Get percent completed in 1 day
-
-        complete_in_24hrs = pd.DataFrame()
-        complete_in_24hrs['priority'] = self.time_stamp_df['priority']
-        complete_in_24hrs['complete_24_hrs'] = \
-            self.time_stamp_df['data_analysis_out'] <= self._params.day_duration
-        pivot = complete_in_24hrs.pivot_table(
-            index='priority',
-            values='complete_24_hrs',
-            aggfunc=[np.mean],
-            margins=True)
-        pivot = pivot['mean']
-        self.audit.complete_in_24hrs = pivot
+        """Get summaries of completed entities from completion sink."""
+        (self.audit.time_stamp_medians,
+         self.audit.time_stamp_by_priority_pct_50,
+         self.audit.time_stamp_by_priority_pct_95,
+         self.audit.complete_in_24hrs) = self.completion_sink.summarise(
+            self.audit.warm_up)
+
+    def request_dispatch(self):
+        """Request a dispatch pass (used in 'event' dispatch mode). Called
+        when work is added to a queue, resources are released, or a shift
+        changes. Multiple requests at the same time share one pass."""
+        self._dispatch_pending = True
+        if (self._dispatch_trigger is not None and
+                not self._dispatch_trigger.triggered):
+            self._dispatch_trigger.succeed()
+
+    def schedule_dispatch(self, delay):
+        """Request a dispatch pass after a delay (used in 'event' dispatch
+        mode when a process interval is not yet due)."""
+        due = self._env.now + delay
+        next_due = self._next_timed_dispatch
+        if next_due is None or due < next_due:
+            self._next_timed_dispatch = due
 
     def set_up_audit(self):
         self.audit = Audit(self)
@@ -432,9 +396,34 @@ class Process:
                 self._env.process(
                     self.process_steps.generate_tea_breaks(tea_break))
 
+    def set_up_resource_allocator(self):
+        self.resource_allocator = ResourceAllocator(self)
+
+    def set_up_roster(self):
+        self.roster = Roster(self)
+
     def set_up_process_steps(self):
         self.process_steps = ProcessSteps(self)
 
+    def process_start_changes(self):
+        """Request a dispatch pass at each process start window boundary
+        (used in 'event' dispatch mode; resource shift changes are handled by
+        the roster)."""
+        day_duration = self._params.day_duration
+        boundaries = set()
+        for hours in self._params.process_start_hours.values():
+            boundaries.update(hour * 60 % day_duration for hour in hours)
+        boundaries = sorted(boundaries)
+
+        day_start = 0
+        while True:
+            for boundary in boundaries:
+                delay = day_start + boundary - self._env.now
+                if delay >= 0:
+                    yield self._env.timeout(delay)
+                    self.request_dispatch()
+            day_start += day_duration
+
     def split_after_heat(self):
         self.process_steps.split(
             self._params.heat_batch_size,
@@ -1,7 +1,10 @@
+from functools import partial
+
 import numpy as np
-import random
 
 from sim_utils.entity import Entity
+from sim_utils.plan import BREAK_TRACKER
+from sim_utils.variate_buffer import VariateBuffer
 
 
 class ProcessSteps:
@@ -34,6 +37,9 @@ class ProcessSteps:
     generate_input:
         Continuous loop of work arrival. Adds new work to batch input.
 
+    inherit_time_stamps:
+        Copies time stamps of a job for the entity created from it.
+
     occupy_resources_automated_subprocess:
         Obtains and occupied resources for a automated process step. Includes
         set-up and clean-down steps that also require human.
@@ -41,6 +47,10 @@ class ProcessSteps:
     occupy_resources_single_subprocess:
         Obtains and occupied resources for a single process step.
 
+    set_random_streams:
+        Take random numbers from new random number streams (e.g. for runs
+        forked from a warmed up model).
+
     split:
         Splits a single entity into multipel entitites
         Admin step that requires no time or resources.
@@ -51,18 +61,28 @@ class ProcessSteps:
     def __init__(self, _process):
 
         self._env = _process._env
+        self._allocator = _process.resource_allocator
         self._batch_id_count = _process.batch_id_count
         self._completed_count = 0
         self._count_in = _process.count_in
         self._count_out = _process.count_out
-        self._fte_on_break = _process.fte_on_break
         self._id_count = _process.id_count
         self._params = _process._params
+        self._plan = _process._plan
+        self._kanban_group_counts = _process.kanban_group_counts
         self.queue_monitors = _process.queue_monitors
         self._queues = _process.queues
         self._resources = _process.resources
-        self._resources_available = _process.resources_available
-        self._resources_occupied = _process.resources_occupied
+        self._resource_list = _process.resource_list
+        self._resources_on_shift = _process.resources_on_shift
+        self._request_dispatch = _process.request_dispatch
+        self._time_stamps = _process.time_stamps
+        self._trackers = _process.trackers
+        self._break_tracker = (_process._plan.tracker_ids[BREAK_TRACKER],)
+        self._completion_sink = _process.completion_sink
+
+        self.set_random_streams(_process.random_streams)
+
         self._workstation_assigned_jobs = _process.workstation_assigned_jobs
 
         self.process_step_counters = _process.process_step_counters
@@ -90,20 +110,19 @@ class ProcessSteps:
         new_batches = int(
             np.ceil(orginal_batch_size / self._params.basic_batch_size))
 
-        job.time_stamps['time_in_batched'] = self._env.now
+        self._time_stamps.stamp(
+            job.time_stamp_row, 'time_in_batched', self._env.now)
 
         if new_batches > 1:
             for _batch in range(new_batches):
                 self._id_count += 1
                 # Set priority
-                if random.random() < self._params.high_priority:
+                if self._rng_arrivals.random() < self._params.high_priority:
                     priority = 0
                 else:
                     priority = 100
 
-                entity = Entity(_env=self._env,
-                                _params=self._params,
-                                batch_id=job.batch_id,
+                entity = Entity(batch_id=job.batch_id,
                                 batch_size=self._params.basic_batch_size,
                                 entity_id=self._id_count,
                                 entity_type='sample tubes',
@@ -112,13 +131,18 @@ class ProcessSteps:
                                 parent_ids=[job.entity_id],
                                 priority=priority + self._id_count/1e4,
                                 time_in=job.time_in,
-                                time_stamps=job.time_stamps)
+                                time_stamp_row=self._time_stamps.copy_row(
+                                    job.time_stamp_row))
 
                 # Add to sample_accession queue
                 # Keep all priority different - use id
                 item = (entity.priority, entity)
                 self._queues['q_sample_preprocess'].put(item)
 
+            self._request_dispatch()
+
+        # Batch entity time stamps have been copied to new entities
+        self._time_stamps.release(job.time_stamp_row)
         self._workstation_assigned_jobs[workstation] -= 1
 
     def breakdown(self, resource, breakdown_time):
@@ -126,37 +150,12 @@ class ProcessSteps:
         with self._resources[resource].request(priority=0) as req:
             # Get resource as soon as free
             yield req
-            self._resources_available[resource] -= 1
-            self._resources_occupied[resource] += 1
+            resource_id = self._plan.resource_ids[resource]
+            self._allocator.occupy([resource_id])
             # Breakdown time
             yield self._env.timeout(breakdown_time)
             # Breakdown complete (repaired)
-            self._resources_available[resource] += 1
-            self._resources_occupied[resource] -= 1
-
-    def check_resourse_availability(self, resources_required):
-        time_of_day = self._env.now % self._params.day_duration
-        number_of_recources_required = len(resources_required)
-        number_of_recources_found = 0
-
-        resources_selected = []  # names of selected resources
-        # Look through all resources required
-        for resource_list in resources_required:
-            # Check availability of alternative resources
-            for resource in resource_list:
-                # Check whether time is within shift operating times
-                shift = self._params.resource_shifts[resource]
-                shift_available = shift[0] <= time_of_day < shift[1]
-                # Check number of resources available
-                if shift_available and self._resources_available[resource] > 0:
-                    number_of_recources_found += 1
-                    resources_selected.append(resource)
-                    break
-
-        all_resources_found = (True if number_of_recources_required ==
-                                       number_of_recources_found else False)
-
-        return (all_resources_found, resources_selected)
+            self._allocator.release([resource_id])
 
     def collate(self, batch_size, from_queue, to_queue):
         """ Admin step that requires no time or resources.
@@ -167,8 +166,8 @@ class ProcessSteps:
             # Priority will be set to highest priority in batch (lowest #)
             priority = 9999
             # Get entities to combine
-            for i in range(batch_size):
-                ent = self._queues[from_queue].get()[1]
+            items = self._queues[from_queue].get_many(batch_size)
+            for i, (_priority, ent) in enumerate(items):
                 new_batch_size += ent.batch_size
                 parent_ids.append(ent.entity_id)
 
@@ -176,11 +175,14 @@ class ProcessSteps:
                 self.record_queuing_time(
                     ent.last_queue, ent.last_queue_time_in, self._env.now)
 
-                # Use initial batch id and time in from first entity
+                # Use initial batch id, time in and time stamps from first
+                # entity
                 if i == 0:
                     batch_id = ent.batch_id
                     time_in = ent.time_in
-                    time_stamps = ent.time_stamps
+                    time_stamp_row = ent.time_stamp_row
+                else:
+                    self._time_stamps.release(ent.time_stamp_row)
 
                 # Adjust priority if new higher priority batch found
                 if ent.priority < priority:
@@ -188,9 +190,7 @@ class ProcessSteps:
 
             # Generate new entity    
             self._id_count += 1
-            new_ent = Entity(_env=self._env,
-                             _params=self._params,
-                             batch_id=batch_id,
+            new_ent = Entity(batch_id=batch_id,
                              batch_size=new_batch_size,
                              entity_id=self._id_count,
                              entity_type='collated',
@@ -199,9 +199,10 @@ class ProcessSteps:
                              parent_ids=parent_ids,
                              priority=priority,
                              time_in=time_in,
-                             time_stamps=time_stamps)
+                             time_stamp_row=time_stamp_row)
             # Add to queue
             self._queues[to_queue].put((priority, new_ent))
+            self._request_dispatch()
 
     def data_analysis(self, workstation, job):
         """Data analysis process step. """
@@ -214,7 +215,7 @@ class ProcessSteps:
         # resources)
 
         resources_required = \
-            self._params.process_resources['data_analysis']['human_list']
+            self._plan.process_resources['data_analysis']['human_list']
 
         # Process time
         process_times = self._params.process_duration['data_analysis'][0]
@@ -228,24 +229,22 @@ class ProcessSteps:
         # Generate new entity (one output entity per job)
         self._id_count += 1
 
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size * 4,
                         entity_id=self._id_count,
                         entity_type='data analysis',
-                        last_queue='q_completed',
+                        last_queue='',
                         last_queue_time_in=self._env.now,
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         self._env.process(self.occupy_resources_single_subprocess(
             workstation=workstation, resources_required=resources_required,
             process_time=process_time,
             priority=process_priority, entity_to_create=entity,
-            queue_to_add_new_entity='q_completed', process_step='data_analysis'))
+            queue_to_add_new_entity=None, process_step='data_analysis'))
 
         self.record_queuing_time(
             'q_data_analysis', job.last_queue_time_in, self._env.now)
@@ -262,7 +261,7 @@ class ProcessSteps:
         model parameters file."""
 
         # Spread break starts by adding random delay over set period
-        delay = np.random.uniform(0, self._params.break_start_spread)
+        delay = self._rng_breaks.uniform(0, self._params.break_start_spread)
         yield self._env.timeout(delay)
 
         # Get resources for break  (does not interupt work)
@@ -270,14 +269,13 @@ class ProcessSteps:
             # Get resource as soon as free
             yield req
             # Break time
-            self._fte_on_break[0] += 1
-            self._resources_available[resource] -= 1
-            self._resources_occupied[resource] += 1
+            self._trackers.change(self._break_tracker, 1)
+            resource_id = self._plan.resource_ids[resource]
+            self._allocator.occupy([resource_id])
             yield self._env.timeout(break_time)
             # End break
-            self._resources_available[resource] += 1
-            self._resources_occupied[resource] -= 1
-            self._fte_on_break[0] -= 1
+            self._trackers.change(self._break_tracker, -1)
+            self._allocator.release([resource_id])
 
     def generate_breakdowns(self):
         while True:
@@ -287,8 +285,8 @@ class ProcessSteps:
                 if unavailability > 0:
                     number_of_resources = self._params.resource_numbers[
                         resource]
-                    number_unavailable = np.random.binomial(number_of_resources,
-                                                            unavailability)
+                    number_unavailable = self._rng_breakdowns.binomial(
+                        number_of_resources, unavailability)
                     if number_unavailable > 0:
                         # Resources are unavailable for a day
                         time_unavailable = self._params.day_duration
@@ -304,22 +302,18 @@ class ProcessSteps:
         # Delay sets time of break in day
         yield self._env.timeout(delay)
         while True:
-            # Get current time
-            time_of_day = self._env.now % self._params.day_duration
             # Loop through resources
             for resource in self._params.fte_resources:
                 # Only call for a break if shift activate at the time
-                # Check whether time is within shift operating times
-                shift = self._params.resource_shifts[resource]
-                shift_available = shift[0] <= time_of_day < shift[1]
-                if shift_available:
+                resource_id = self._plan.resource_ids[resource]
+                if self._resources_on_shift[resource_id]:
                     # Loop through numbers in each resource pool
                     for _i in range(self._params.resource_numbers[resource]):
                         # Set break duration
                         min_duration = self._params.meal_break_duration[0]
                         max_duration = self._params.meal_break_duration[1]
-                        break_time = np.random.uniform(min_duration,
-                                                       max_duration)
+                        break_time = self._rng_breaks.uniform(min_duration,
+                                                              max_duration)
                         # Call break 
                         self._env.process(self.fte_break(resource, break_time))
                         # 1 day delay before next call
@@ -331,22 +325,18 @@ class ProcessSteps:
         # Delay sets time of break in day
         yield self._env.timeout(delay)
         while True:
-            # Get current time
-            time_of_day = self._env.now % self._params.day_duration
             # Loop through resources
             for resource in self._params.fte_resources:
                 # Only call for a break if shift activate at the time
-                # Check whether time is within shift operating times
-                shift = self._params.resource_shifts[resource]
-                shift_available = shift[0] <= time_of_day < shift[1]
-                if shift_available:
+                resource_id = self._plan.resource_ids[resource]
+                if self._resources_on_shift[resource_id]:
                     # Loop through numbers in each resource pool
                     for _i in range(self._params.resource_numbers[resource]):
                         # Set break duration
                         min_duration = self._params.tea_break_duration[0]
                         max_duration = self._params.tea_break_duration[1]
-                        break_time = np.random.uniform(min_duration,
-                                                       max_duration)
+                        break_time = self._rng_breaks.uniform(min_duration,
+                                                              max_duration)
                         # Call break 
                         self._env.process(self.fte_break(resource, break_time))
             # 1 day delay before next call        
@@ -366,11 +356,9 @@ class ProcessSteps:
             # generate new entity and add to list of current entities
             self._id_count += 1
             self._batch_id_count += 1
-            time_stamps = dict()
-            time_stamps['time_in'] = self._env.now
-            arrival_ent = Entity(_env=self._env,
-                                 _params=self._params,
-                                 batch_id=self._batch_id_count,
+            time_stamp_row = self._time_stamps.new_row()
+            self._time_stamps.stamp(time_stamp_row, 'time_in', self._env.now)
+            arrival_ent = Entity(batch_id=self._batch_id_count,
                                  batch_size=delivery_size,
                                  entity_id=self._id_count,
                                  entity_type='arrival batch',
@@ -379,10 +367,11 @@ class ProcessSteps:
                                  last_queue='q_batch_input',
                                  last_queue_time_in=self._env.now,
                                  time_in=self._env.now,
-                                 time_stamps=time_stamps)
+                                 time_stamp_row=time_stamp_row)
 
             # Add to queue for batching input
             self._queues['q_batch_input'].put((1, arrival_ent))
+            self._request_dispatch()
 
             # Log input
             input_log = [self._batch_id_count, self._env.now, delivery_size]
@@ -391,6 +380,13 @@ class ProcessSteps:
             # Schedule next admission
             yield self._env.timeout(self._params.day_duration)
 
+    def inherit_time_stamps(self, job):
+        """Copy time stamps of a job to a new row for the entity created from
+        the job, and release the job's row (job leaves the model)."""
+        time_stamp_row = self._time_stamps.copy_row(job.time_stamp_row)
+        self._time_stamps.release(job.time_stamp_row)
+        return time_stamp_row
+
     def occupy_resources_automated_subprocess(self, workstation, human_resources, machine_resources,
                                               stage_process_times, priority, entity_to_create, queue_to_add_new_entity,
                                               process_step):
@@ -407,34 +403,29 @@ class ProcessSteps:
 
         # Record time in
         key = process_step + '_in'
-        entity_to_create.time_stamps[key] = self._env.now
+        self._time_stamps.stamp(
+            entity_to_create.time_stamp_row, key, self._env.now)
 
         # Add random 10 second delay (to avoid jobs asking for resources at
         # exactly the same time)
 
-        delay = np.random.random() * 10
+        delay = self._jitter.next() * 10
         delay = delay / (1440 * 60)  # Convert to seconds
         yield self._env.timeout(delay)
 
-        search_for_resources = True
-
-        # continue looking for resources until all available
-        while search_for_resources:
+        # Wait until machine and human resources are all available (resource
+        # counts are adjusted when resources are allocated)
+        resources_selected = yield self._allocator.acquire(
+            machine_resources + human_resources, priority)
+        machine_resources_selected = \
+            resources_selected[:len(machine_resources)]
+        human_resources_selected = resources_selected[len(machine_resources):]
 
-            # Search for machine and human resources
-            machine_resources_found, machine_resources_selected = \
-                self.check_resourse_availability(machine_resources)
-
-            human_resources_found, human_resources_selected = \
-                self.check_resourse_availability(human_resources)
-            # Check both resources found
-            if human_resources_found and machine_resources_found:
-                # All resources are available
-                search_for_resources = False
-                break
-            else:
-                # Not all resources found wait for 1 min continue loop
-                yield self._env.timeout(1)
+        # Count jobs and staff in process step
+        resource_trackers = self._plan.process_resources[process_step]
+        human_trackers = resource_trackers['human_trackers']
+        machine_trackers = resource_trackers['machine_trackers']
+        self._trackers.change(machine_trackers + human_trackers, 1)
 
         # Steps to take after finding all resources
 
@@ -444,36 +435,27 @@ class ProcessSteps:
         human_resource_requests = []
         machine_resource_requests = []
 
-        # Adjust resource counts
-
-        for resource in machine_resources_selected:
-            self._resources_available[resource] -= 1
-            self._resources_occupied[resource] += 1
-
-        for resource in human_resources_selected:
-            self._resources_available[resource] -= 1
-            self._resources_occupied[resource] += 1
-
         # Request resources
 
         for resource in machine_resources_selected:
-            req = self._resources[resource].request(priority=priority)
-            machine_resource_requests.append((self._resources[resource], req))
+            req = self._resource_list[resource].request(priority=priority)
+            machine_resource_requests.append(
+                (self._resource_list[resource], req))
             yield req
 
         for resource in human_resources_selected:
-            req = self._resources[resource].request(priority=priority)
-            human_resource_requests.append((self._resources[resource], req))
+            req = self._resource_list[resource].request(priority=priority)
+            human_resource_requests.append(
+                (self._resource_list[resource], req))
             yield req
 
         # Resources co-opted
 
         self.process_step_counters[process_step] += 1
 
-        # Add NumPy triangular additional time
+        # Add triangular additional time
         process_time = stage_process_times[0]
-        process_time *= np.random.triangular(
-            1.0, 1.0, 1 + self._params.additional_time_manual)
+        process_time *= self._extra_time_manual[process_step].next()
 
         # All resources committed: run process
         yield self._env.timeout(process_time)
@@ -483,18 +465,16 @@ class ProcessSteps:
             resource.release(req)
 
         # Release human resource counts
-        for chosen_resource in human_resources_selected:
-            self._resources_available[chosen_resource] += 1
-            self._resources_occupied[chosen_resource] -= 1
+        self._allocator.release(human_resources_selected)
+        self._trackers.change(human_trackers, -1)
 
         ########################################################################
 
         # Automated process time
 
-        # Add NumPy triangular additional time
+        # Add triangular additional time
         process_time = stage_process_times[1]
-        process_time *= np.random.triangular(
-            1.0, 1.0, 1 + self._params.additional_time_auto)
+        process_time *= self._extra_time_auto[process_step].next()
 
         # All resources commited: run process
         yield self._env.timeout(process_time)
@@ -503,38 +483,24 @@ class ProcessSteps:
 
         # Clean down - require human resources again
 
-        search_for_resources = True
-
-        # continue looking for resources until all available
-        while search_for_resources:
-            # Search for humand and machien resoucres
-            human_resources_found, human_resources_selected = \
-                self.check_resourse_availability(human_resources)
-            # Check resources found
-            if human_resources_found:
-                # All resources are available
-                search_for_resources = False
-                break
-            else:
-                # Not all resources found wait for 1 min continue loop
-                yield self._env.timeout(1)
+        # Wait until human resources are available (resource counts are
+        # adjusted when resources are allocated)
+        human_resources_selected = yield self._allocator.acquire(
+            human_resources, priority - 1)
+        self._trackers.change(human_trackers, 1)
 
-        # Request human resources from environment (adjust counts then request)
+        # Request human resources from environment
 
         human_resource_requests = []
         for resource in human_resources_selected:
-            self._resources_available[resource] -= 1
-            self._resources_occupied[resource] += 1
-
-        for resource in human_resources_selected:
-            req = self._resources[resource].request(priority=priority - 1)
-            human_resource_requests.append((self._resources[resource], req))
+            req = self._resource_list[resource].request(priority=priority - 1)
+            human_resource_requests.append(
+                (self._resource_list[resource], req))
             yield req
 
-        # Add NumPy triangular additional time
+        # Add triangular additional time
         process_time = stage_process_times[2]
-        process_time *= np.random.triangular(
-            1.0, 1.0, 1 + self._params.additional_time_manual)
+        process_time *= self._extra_time_manual[process_step].next()
 
         # All resources committed: run process
         yield self._env.timeout(process_time)
@@ -547,23 +513,19 @@ class ProcessSteps:
         for resource, req in human_resource_requests:
             resource.release(req)
 
-        # Release human resource counts
-        for chosen_resource in human_resources_selected:
-            self._resources_available[chosen_resource] += 1
-            self._resources_occupied[chosen_resource] -= 1
-
         # release machine resources
         for resource, req in machine_resource_requests:
             resource.release(req)
 
-        # Release machine resource counts
-        for chosen_resource in machine_resources_selected:
-            self._resources_available[chosen_resource] += 1
-            self._resources_occupied[chosen_resource] -= 1
+        # Release human and machine resource counts
+        self._allocator.release(
+            human_resources_selected + machine_resources_selected)
+        self._trackers.change(machine_trackers + human_trackers, -1)
 
         # Record time out
         key = process_step + '_out'
-        entity_to_create.time_stamps[key] = self._env.now
+        self._time_stamps.stamp(
+            entity_to_create.time_stamp_row, key, self._env.now)
 
         # Add entity to queue
         entity_to_create.last_queue_time_in = self._env.now
@@ -577,6 +539,8 @@ class ProcessSteps:
         # Reduce kanban counts as necessary
         self.reduce_kanban_counts(process_step, entity_to_create.batch_size)
 
+        self._request_dispatch()
+
     def occupy_resources_single_subprocess(self, workstation, resources_required, process_time, priority,
                                            entity_to_create, queue_to_add_new_entity, process_step):
 
@@ -589,50 +553,40 @@ class ProcessSteps:
 
         # Record time in
         key = process_step + '_in'
-        entity_to_create.time_stamps[key] = self._env.now
+        self._time_stamps.stamp(
+            entity_to_create.time_stamp_row, key, self._env.now)
 
         # Add random 10 second delay (to avoid jobs asking for resources at
         # exactly the same time)
 
-        delay = np.random.random() * 10
+        delay = self._jitter.next() * 10
         delay = delay / (1440 * 60)  # Convert to seconds
         yield self._env.timeout(delay)
 
-        search_for_resources = True
+        # Wait until all resources are available (resource counts are
+        # adjusted when resources are allocated)
+        resources_selected = yield self._allocator.acquire(
+            resources_required, priority)
 
-        # continue looking for resources until all available
-        while search_for_resources:
-            all_resources_found, resources_selected = \
-                self.check_resourse_availability(resources_required)
-            if all_resources_found:
-                # All resources are available
-                search_for_resources = False
-                break
-            else:
-                # Not all resources found wait for 1 min continue loop
-                yield self._env.timeout(1)
+        # Count jobs and staff in process step
+        trackers = self._plan.process_resources[process_step]['human_trackers']
+        self._trackers.change(trackers, 1)
 
         # Steps to take after finding all resources
 
         self.process_step_counters[process_step] += 1
 
-        # Adjust resource counts
+        # Request resources from environment
 
         resource_requests = []  # resource request obejects
-        for resource in resources_selected:
-            self._resources_available[resource] -= 1
-            self._resources_occupied[resource] += 1
-
-        # Request resources from environment
 
         for resource in resources_selected:
-            req = self._resources[resource].request(priority=priority)
-            resource_requests.append((self._resources[resource], req))
+            req = self._resource_list[resource].request(priority=priority)
+            resource_requests.append((self._resource_list[resource], req))
             yield req
 
-        # Add NumPy triangular additional time
-        process_time *= np.random.triangular(
-            1.0, 1.0, 1 + self._params.additional_time_manual)
+        # Add triangular additional time
+        process_time *= self._extra_time_manual[process_step].next()
 
         # All resources committed: run process
         yield self._env.timeout(process_time)
@@ -642,21 +596,21 @@ class ProcessSteps:
             resource.release(req)
 
         # Release resource counts
-        for chosen_resource in resources_selected:
-            self._resources_available[chosen_resource] += 1
-            self._resources_occupied[chosen_resource] -= 1
+        self._allocator.release(resources_selected)
+        self._trackers.change(trackers, -1)
 
         # Record time out
         key = process_step + '_out'
-        entity_to_create.time_stamps[key] = self._env.now
+        self._time_stamps.stamp(
+            entity_to_create.time_stamp_row, key, self._env.now)
 
-        # Add entity to queue
+        # Add entity to queue (completed entities go to completion sink)
         entity_to_create.last_queue_time_in = self._env.now
-        try:
+        if queue_to_add_new_entity is None:
+            self._completion_sink.add(entity_to_create)
+        else:
             self._queues[queue_to_add_new_entity].put(
                 (entity_to_create.priority, entity_to_create))
-        except:
-            print()
 
         # Free workstation
         self._workstation_assigned_jobs[workstation] -= 1
@@ -665,14 +619,16 @@ class ProcessSteps:
         # Reduce kanban counts as necessary
         self.reduce_kanban_counts(process_step, entity_to_create.batch_size)
 
+        self._request_dispatch()
+
     def pcr(self, workstation, job):
 
         num_entities = 1
 
         # Get resources required (a tuple of lists of required alternative
         # resources)
-        human_resources = self._params.process_resources['pcr']['human_list']
-        machine_resources = self._params.process_resources['pcr'][
+        human_resources = self._plan.process_resources['pcr']['human_list']
+        machine_resources = self._plan.process_resources['pcr'][
             'machine_list']
 
         # Process time
@@ -690,9 +646,7 @@ class ProcessSteps:
         # Generate new entity (one output entity per job)
         self._id_count += 1
 
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size * 4,
                         entity_id=self._id_count,
                         entity_type='pcr output',
@@ -701,7 +655,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         self._env.process(self.occupy_resources_automated_subprocess(
             workstation=workstation, human_resources=human_resources,
@@ -720,9 +674,9 @@ class ProcessSteps:
 
         # Get resources required (a tuple of list of required alternative
         # resources)
-        human_resources = self._params.process_resources['pcr_prep'][
+        human_resources = self._plan.process_resources['pcr_prep'][
             'human_list']
-        machine_resources = self._params.process_resources['pcr_prep'][
+        machine_resources = self._plan.process_resources['pcr_prep'][
             'machine_list']
 
         # Process time
@@ -740,9 +694,7 @@ class ProcessSteps:
         # Generate new entity (one output entity per job)
         self._id_count += 1
 
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size * 4,
                         entity_id=self._id_count,
                         entity_type='plate for pcr read',
@@ -751,7 +703,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         self._env.process(self.occupy_resources_automated_subprocess(
             workstation=workstation, human_resources=human_resources,
@@ -765,17 +717,16 @@ class ProcessSteps:
 
     def record_queuing_time(self, queue, time_in, time_out):
 
-        """Add time entered/left queue to process queue monitors"""
+        """Add time in queue to process queue monitors"""
 
-        self.queue_monitors[queue].append((time_in, time_out))
+        self.queue_monitors[queue].add(time_out - time_in)
 
     def reduce_kanban_counts(self, process, quantity):
         """Reduce quantity in kanban group if process is at end of a kanban 
         group"""
-        relevant_kanban_groups = self._params.kanban_end[process]
-        if len(relevant_kanban_groups) > 0:
-            for kanban_group in relevant_kanban_groups:
-                self._params.kanban_group_counts[kanban_group] -= quantity
+        process_id = self._plan.process_ids[process]
+        for kanban_group in self._plan.kanban_end[process_id]:
+            self._kanban_group_counts[kanban_group] -= quantity
 
     def rna_extraction(self, workstation, job):
 
@@ -783,9 +734,9 @@ class ProcessSteps:
 
         # Get resources required (a tuple of list of required alternative
         # resources)
-        human_resources = self._params.process_resources['rna_extraction'][
+        human_resources = self._plan.process_resources['rna_extraction'][
             'human_list']
-        machine_resources = self._params.process_resources['rna_extraction'][
+        machine_resources = self._plan.process_resources['rna_extraction'][
             'machine_list']
 
         # Process time
@@ -803,9 +754,7 @@ class ProcessSteps:
         # Generate new entity (one output entity per job)
         self._id_count += 1
 
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size,
                         entity_id=self._id_count,
                         entity_type='plate for pcr',
@@ -814,7 +763,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         self._env.process(self.occupy_resources_automated_subprocess(
             workstation=workstation, human_resources=human_resources,
@@ -834,9 +783,9 @@ class ProcessSteps:
 
         # Get resources required (a tuple of list of required alternative
         # resources)
-        human_resources = self._params.process_resources['sample_heat'][
+        human_resources = self._plan.process_resources['sample_heat'][
             'human_list']
-        machine_resources = self._params.process_resources['sample_heat'][
+        machine_resources = self._plan.process_resources['sample_heat'][
             'machine_list']
 
         # Process time
@@ -855,9 +804,7 @@ class ProcessSteps:
         self._id_count += 1
 
         # Define entity to create
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size,
                         entity_id=self._id_count,
                         entity_type='samples in tubes for heat inactivation',
@@ -866,7 +813,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         # Define queue to add new entity to
         self._env.process(self.occupy_resources_automated_subprocess(
@@ -889,9 +836,9 @@ class ProcessSteps:
 
         # Get resources required (a tuple of list of required alternative
         # resources)
-        human_resources = self._params.process_resources['sample_prep_auto'][
+        human_resources = self._plan.process_resources['sample_prep_auto'][
             'human_list']
-        machine_resources = self._params.process_resources['sample_prep_auto'][
+        machine_resources = self._plan.process_resources['sample_prep_auto'][
             'machine_list']
 
         # Process time
@@ -910,9 +857,7 @@ class ProcessSteps:
         self._id_count += 1
 
         # Define entity to create
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size,
                         entity_id=self._id_count,
                         entity_type='samples in plate for pcr',
@@ -921,7 +866,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         # Define queue to add new entitiy to
         self._env.process(self.occupy_resources_automated_subprocess(
@@ -947,7 +892,7 @@ class ProcessSteps:
         # resources)
 
         resources_required = \
-            self._params.process_resources['sample_prep_manual']['human_list']
+            self._plan.process_resources['sample_prep_manual']['human_list']
 
         # Process time
         process_times = self._params.process_duration['sample_prep_manual'][0]
@@ -962,9 +907,7 @@ class ProcessSteps:
         self._id_count += 1
 
         # Define entity to create
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size,
                         entity_id=self._id_count,
                         entity_type='samples in plate for pcr',
@@ -973,7 +916,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         # Define queue to add new entitiy to
         self._env.process(self.occupy_resources_single_subprocess(
@@ -999,7 +942,7 @@ class ProcessSteps:
 
         # Get resources required (a tuple of list of required alternative
         # resources)
-        resources_required = self._params.process_resources['sample_preprocess'][
+        resources_required = self._plan.process_resources['sample_preprocess'][
             'human_list']
 
         # Process time
@@ -1014,9 +957,7 @@ class ProcessSteps:
         # Generate new entity (one output entity per job)
         self._id_count += 1
 
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size,
                         entity_id=self._id_count,
                         entity_type='registered samples',
@@ -1025,7 +966,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         self._env.process(self.occupy_resources_single_subprocess(
             workstation=workstation, resources_required=resources_required,
@@ -1050,7 +991,7 @@ class ProcessSteps:
 
         # Get resources required (a tuple of list of required alternative
         # resources)
-        resources_required = self._params.process_resources['sample_receipt'][
+        resources_required = self._plan.process_resources['sample_receipt'][
             'human_list']
 
         # Process time
@@ -1065,9 +1006,7 @@ class ProcessSteps:
         # Generate new entity (one output entity per job)
         self._id_count += 1
 
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size,
                         entity_id=self._id_count,
                         entity_type='rack of tubes for sample prep',
@@ -1076,7 +1015,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         self._env.process(self.occupy_resources_single_subprocess(
             workstation=workstation, resources_required=resources_required,
@@ -1087,6 +1026,28 @@ class ProcessSteps:
         self.record_queuing_time(
             'q_sample_receipt', job.last_queue_time_in, self._env.now)
 
+    def set_random_streams(self, random_streams):
+        """Set random number streams (RandomStreams) used by process steps.
+        Variates already drawn into buffers are discarded."""
+
+        self._rng_arrivals = random_streams.arrivals
+        self._rng_breakdowns = random_streams.breakdowns
+        self._rng_breaks = random_streams.breaks
+
+        # Buffered variates drawn on every job: anti-tie delays, and
+        # triangular additional time for manual and automated stages of each
+        # process step
+        self._jitter = VariateBuffer(random_streams.jitter.random)
+        self._extra_time_manual = dict()
+        self._extra_time_auto = dict()
+        for name, rng in random_streams.process_steps.items():
+            self._extra_time_manual[name] = VariateBuffer(partial(
+                rng.triangular, 1.0, 1.0,
+                1 + self._params.additional_time_manual))
+            self._extra_time_auto[name] = VariateBuffer(partial(
+                rng.triangular, 1.0, 1.0,
+                1 + self._params.additional_time_auto))
+
     def split(self, batch_size, from_queue, to_queue):
         """ Admin step that requires no time or resources"""
         while not self._queues[from_queue].empty():
@@ -1095,9 +1056,7 @@ class ProcessSteps:
             new_batch_size = int(ent.batch_size / batch_size)
             for i in range(batch_size):
                 self._id_count += 1
-                new_ent = Entity(_env=self._env,
-                                 _params=self._params,
-                                 batch_id=ent.batch_id,
+                new_ent = Entity(batch_id=ent.batch_id,
                                  batch_size=new_batch_size,
                                  entity_id=self._id_count,
                                  entity_type='split',
@@ -1107,9 +1066,12 @@ class ProcessSteps:
                                  # Tweak priority to avoid clash of priorities
                                  priority=ent.priority + i/1e6,
                                  time_in=ent.time_in,
-                                 time_stamps=ent.time_stamps)
+                                 time_stamp_row=self._time_stamps.copy_row(
+                                     ent.time_stamp_row))
                 # Add to queue
                 self._queues[to_queue].put((new_ent.priority, new_ent))
+            self._time_stamps.release(ent.time_stamp_row)
+            self._request_dispatch()
 
     def transfer_1(self, workstation, job):
         """
@@ -1124,7 +1086,7 @@ class ProcessSteps:
 
         # Get resources required (a tuple of list of required alternative
         # resources)
-        resources_required = self._params.process_resources['transfer_1'][
+        resources_required = self._plan.process_resources['transfer_1'][
             'human_list']
 
         # Process time
@@ -1139,9 +1101,7 @@ class ProcessSteps:
         # Generate new entity (one output entity per job)
         self._id_count += 1
 
-        entity = Entity(_env=self._env,
-                        _params=self._params,
-                        batch_id=job.batch_id,
+        entity = Entity(batch_id=job.batch_id,
                         batch_size=self._params.basic_batch_size,
                         entity_id=self._id_count,
                         entity_type='plates in transfer',
@@ -1150,7 +1110,7 @@ class ProcessSteps:
                         parent_ids=[job.entity_id],
                         priority=job.priority,
                         time_in=job.time_in,
-                        time_stamps=job.time_stamps.copy())
+                        time_stamp_row=self.inherit_time_stamps(job))
 
         self._env.process(self.occupy_resources_single_subprocess(
             workstation=workstation, resources_required=resources_required,
@@ -0,0 +1,136 @@
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with bounded relative error (log-spaced bins, as
+    in DDSketch). Values are counted in bins whose width grows in proportion
+    to the value, so any quantile is returned to within the relative accuracy
+    set, and memory depends on the range of values seen rather than on the
+    number of values. Sketches with the same relative accuracy can be merged.
+
+    Sketches are pickled (e.g. returned from worker processes) with bins as
+    counts of consecutive bins in bytes rather than as a dictionary.
+
+    Values must be non-negative (values less than `min_value` are counted as
+    zero).
+
+    Attributes
+    ----------
+    count: Number of values added (int)
+    max: Maximum value added (float)
+    min: Minimum value added (float)
+    relative_accuracy: Relative accuracy of quantiles returned (float)
+
+    Methods
+    -------
+    add:
+        Add a value
+
+    merge:
+        Add counts from another sketch
+
+    quantile:
+        Return (approximate) quantile of values added
+
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6):
+        """
+        Constructor method for quantile sketch
+
+        Parameters
+        ----------
+        relative_accuracy : float
+            Relative accuracy of quantiles returned
+        min_value : float
+            Values below this are counted as zero
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._min_value = min_value
+        self._zero_count = 0
+        # Dictionary of bin -> count
+        self._bins = dict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._bins:
+            # Counts of consecutive bins from the lowest bin, in the
+            # smallest unsigned integer type that holds them
+            first = min(self._bins)
+            counts = np.zeros(max(self._bins) - first + 1, dtype=np.int64)
+            for key, count in self._bins.items():
+                counts[key - first] = count
+            counts = counts.astype(np.min_scalar_type(counts.max()))
+            state['_bins'] = (first, counts.dtype.str, counts.tobytes())
+        else:
+            state['_bins'] = None
+        return state
+
+    def __setstate__(self, state):
+        bins = state['_bins']
+        self.__dict__.update(state)
+        self._bins = dict()
+        if bins is not None:
+            first, dtype, data = bins
+            counts = np.frombuffer(data, dtype=dtype)
+            for key in np.flatnonzero(counts).tolist():
+                self._bins[first + key] = int(counts[key])
+
+    def add(self, value):
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value < self._min_value:
+            self._zero_count += 1
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self._bins[key] = self._bins.get(key, 0) + 1
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Sketches must have the same relative accuracy '
+                             'to be merged')
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._zero_count += other._zero_count
+        for key, count in other._bins.items():
+            self._bins[key] = self._bins.get(key, 0) + count
+
+    def quantile(self, q):
+        """Return quantile q (0-1) of values added (NaN if no values)."""
+        if self.count == 0:
+            return np.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        cumulative = self._zero_count
+        if cumulative > rank:
+            return 0.0
+        for key in sorted(self._bins):
+            cumulative += self._bins[key]
+            if cumulative > rank:
+                # Mid-point of bin (within relative accuracy of all values
+                # in bin), limited to range of values seen
+                value = 2 * self._gamma ** key / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
@@ -0,0 +1,68 @@
+import zlib
+
+import numpy as np
+
+
+class RandomStreams:
+    """
+    Independent random number streams for a single model run, all derived from
+    one seed with NumPy SeedSequence. Each source of randomness has its own
+    NumPy Generator, so a run is reproducible from its seed alone, and a
+    change in how often one source is used (e.g. more breakdowns) does not
+    shift the random numbers used by other sources.
+
+    Process step streams are keyed by process step name (rather than by
+    position), so the same process step gets the same stream in scenarios
+    with different process steps.
+
+    Attributes
+    ----------
+    arrivals: Generator for delivery batch priorities
+    breakdowns: Generator for resource breakdowns
+    breaks: Generator for break durations and break start delays
+    jitter: Generator for small delays that stop jobs asking for resources at
+        exactly the same time
+    process_steps: Process step name -> Generator for additional process time
+    seed: Entropy of root seed (int); pass as seed to reproduce the run
+
+    """
+
+    sources = ('arrivals', 'breakdowns', 'breaks', 'jitter')
+
+    def __init__(self, seed=None, process_step_names=()):
+        """
+        Constructor method for random streams
+
+        Parameters
+        ----------
+        seed : None, int, or sequence of ints
+            Root seed (None takes fresh entropy from the operating system). A
+            SeedSequence is not accepted: its spawn key would not be kept in
+            `seed`, so `seed` would not reproduce the run
+        process_step_names : iterable
+            Names of process steps that need their own stream
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if isinstance(seed, np.random.SeedSequence):
+            raise TypeError('seed must be None, an int, or a sequence of ints,'
+                            ' not a SeedSequence')
+        seed_sequence = np.random.SeedSequence(seed)
+        self.seed = seed_sequence.entropy
+
+        for source, child in zip(self.sources,
+                                 seed_sequence.spawn(len(self.sources))):
+            setattr(self, source, np.random.default_rng(child))
+
+        # Process step streams (spawn key from name)
+        self.process_steps = dict()
+        for name in process_step_names:
+            child = np.random.SeedSequence(
+                seed_sequence.entropy,
+                spawn_key=seed_sequence.spawn_key +
+                (len(self.sources), zlib.crc32(name.encode())))
+            self.process_steps[name] = np.random.default_rng(child)
@@ -1,19 +1,242 @@
+import copy
+import hashlib
+import os
+import pickle
+import sys
+import traceback
+import warnings
+from collections import deque
+from concurrent.futures import as_completed
+
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import numpy as np
 import pandas as pd
-from joblib import Parallel, delayed
+from joblib import cpu_count
+from joblib.externals.loky import get_reusable_executor
+from sim_utils.audit import COMPLETED_QUEUE, queue_time_summary
+from sim_utils.helper_functions import batch_means, confidence_interval
 from sim_utils.model import Model
+from sim_utils.quantile_sketch import QuantileSketch
+from sim_utils.results import ResultSchema
+from sim_utils.selection import (constrained_allocation, ocba_allocation,
+                                 probability_correct_selection)
+
+
+def single_run(scenario, i=0, seed=None):
+    """Single model run. A module-level function so that worker tasks carry
+    only the scenario (not the Replicator and its results)."""
+    print(f'{i}, ', end='' )
+    model = Model(scenario, seed)
+    model.run()
+    return model_results(model)
+
+
+def model_results(model):
+    """Results of a completed model run (dictionary of pandas objects)"""
+
+    # Put results in a dictionary
+    results = {
+        'output': model.process.audit.summary_output,
+        'output_by_day': model.process.audit.summary_output_by_day,
+        'resources': model.process.audit.summary_resources,
+        'max_queues': model.process.audit.max_queue_sizes,
+        'queue_times': model.process.audit.queue_times,
+        'tracker': model.process.audit.tracker_results,
+        'time_stamps': model.process.audit.time_stamp_medians,
+        'time_stamp_by_priority_pct_50':
+            model.process.audit.time_stamp_by_priority_pct_50,
+        'time_stamp_by_priority_pct_95':
+            model.process.audit.time_stamp_by_priority_pct_95,
+        'complete_in_24hrs': model.process.audit.complete_in_24hrs,
+        'queue_time_sketches': model.process.audit.queue_time_sketches
+               }
+
+    return results
+
+
+def run_record(schema, results):
+    """Record of single run results returned from worker processes: results
+    encoded as a flat NumPy array (see ResultSchema) to reduce the cost of
+    returning results, and queue time quantile sketches (queue -> sketch),
+    which are merged across runs."""
+    return schema.encode(results), results['queue_time_sketches']
+
+
+def single_run_record(scenario, i=0, seed=None):
+    """Single model run, returning results record (see `run_record`)."""
+    return run_record(ResultSchema(scenario), single_run(scenario, i, seed))
+
+
+# Run number used for the seed of a warm up shared by forked runs (not used
+# by any real run)
+WARM_UP_RUN = 2 ** 32 - 1
+
+# Caveat for confidence intervals from runs forked from a shared warm up
+FORKED_CAVEAT = ('Runs of each scenario are forked from one shared warm up '
+                 'and are not independent: confidence intervals are too '
+                 'narrow')
+
+# Scenarios registered in a worker process (name -> scenario, results schema)
+_worker_scenarios = dict()
+
+
+def scenarios_fingerprint(scenarios):
+    """Digest of the contents of scenarios (name -> scenario). Changes when a
+    scenario is changed in place, unlike the identity of the scenarios."""
+    return hashlib.sha1(
+        pickle.dumps(scenarios, pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def register_scenarios(scenarios, fingerprint=None):
+    """Worker process initialiser. Keeps scenarios (and their results schemas)
+    in the worker so that each task need only pass a scenario name.
+    `fingerprint` (see `scenarios_fingerprint`) is not used by the worker: as
+    part of the initialiser arguments it makes the reusable executor restart
+    workers when scenario contents change."""
+    _worker_scenarios.clear()
+    for name, scenario in scenarios.items():
+        _worker_scenarios[name] = (scenario, ResultSchema(scenario))
+
+
+def registered_run_record(name, i=0, seed=None):
+    """Single model run of a scenario registered in the worker process,
+    returning results record (see `run_record`)."""
+    scenario, schema = _worker_scenarios[name]
+    return run_record(schema, single_run(scenario, i, seed))
+
+
+def forked_run_records(scenario, seeds, warm_up_seed=None, n_jobs=1):
+    """
+    Model runs of a scenario that share one warm up. The model is run to the
+    end of warm up once. Each run is then a forked copy of this process
+    (holding the full model state: queues, SimPy processes, resources,
+    counters and audit), which continues to the end of the run with random
+    numbers from its own seed. Needs os.fork (POSIX).
+
+    Runs start from the same state at the end of warm up, so are not fully
+    independent of each other: differences between runs come only from the
+    period after warm up (and events already scheduled at the end of warm up,
+    such as the next breakdowns and breaks, are common to all runs). In
+    'mser' warm up mode a detected warm up shorter than `warm_up_days` leaves
+    shared days in the results.
+
+    Parameters
+    ----------
+    scenario : Scenario
+        Scenario to run
+    seeds : list
+        Seed for each run (random numbers after warm up)
+    warm_up_seed : None, int or sequence of ints
+        Seed for warm up
+    n_jobs : int
+        Maximum number of forked runs at one time
+
+    Returns
+    -------
+    List of results records (see `run_record`), in order of seeds
+
+    """
+
+    if not hasattr(os, 'fork'):
+        raise RuntimeError('Runs forked from a warm up need os.fork (POSIX)')
+
+    schema = ResultSchema(scenario)
+    model = Model(scenario, warm_up_seed)
+    model.warm_up()
+    # Do not duplicate buffered output in forked runs
+    sys.stdout.flush()
+
+    records = [None] * len(seeds)
+    children = deque()
+    for i, seed in enumerate(seeds):
+        if len(children) >= n_jobs:
+            _collect_forked_run(children.popleft(), records)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Forked run: continue model and send results record to parent
+            os.close(read_fd)
+            status = 1
+            try:
+                print(f'{i}, ', end='')
+                model.resume(seed)
+                record = run_record(schema, model_results(model))
+                with os.fdopen(write_fd, 'wb') as pipe:
+                    pickle.dump(record, pipe, pickle.HIGHEST_PROTOCOL)
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+        os.close(write_fd)
+        children.append((i, pid, read_fd))
+
+    while children:
+        _collect_forked_run(children.popleft(), records)
+
+    return records
+
+
+def _collect_forked_run(child, records):
+    """Read results record of a forked run, and wait for it to end"""
+    i, pid, read_fd = child
+    with os.fdopen(read_fd, 'rb') as pipe:
+        data = pipe.read()
+    _pid, status = os.waitpid(pid, 0)
+    if status != 0 or len(data) == 0:
+        raise RuntimeError(f'Forked run {i} failed')
+    records[i] = pickle.loads(data)
 
 
 class Replicator:
 
-    def __init__(self, scenarios, replications):
-        """Constructor class for Replicator
+    # Run KPIs checked by default in adaptive replication
+    adaptive_kpis = ['demand_met', 'median_process_time_hours',
+                     'complete_24_hrs_1', 'complete_24_hrs_2',
+                     'complete_24_hrs_All']
+
+    # Daily results estimated by batch means in single long run mode
+    batch_means_kpis = ['output', 'demand_met']
+
+    # Single run results key -> summary DataFrame (all runs) attribute
+    result_summaries = {
+        'output': 'summary_output',
+        'output_by_day': 'summary_output_by_day',
+        'resources': 'summary_resources',
+        'max_queues': 'summary_max_queues',
+        'queue_times': 'summary_queue_times',
+        'tracker': 'summary_tracker',
+        'time_stamps': 'summary_time_stamps',
+        'time_stamp_by_priority_pct_50':
+            'summary_time_stamps_by_priority_pct_50',
+        'time_stamp_by_priority_pct_95':
+            'summary_time_stamps_by_priority_pct_95',
+        'complete_in_24hrs': 'summary_complete_in_24hrs'
+    }
+
+    def __init__(self, scenarios, replications, n_jobs=-1, seed=None,
+                 crn=False, baseline=None):
+        """Constructor class for Replicator. `n_jobs` is the number of worker
+        processes (negative values count back from number of CPUs, as in
+        joblib). `seed` is the root seed for all runs (None takes fresh
+        entropy; the seed used is kept in `seed`).
+
+        With common random numbers (`crn=True`) run i of every scenario uses
+        the same random number streams, and scenarios are reported as paired
+        differences from the `baseline` scenario (default first scenario).
         """
 
+        self.baseline = baseline
+        self.crn = crn
+        self.n_jobs = n_jobs
+        self.seed = np.random.SeedSequence(seed).entropy
         self.replications = replications
         self.scenarios = scenarios
+        # Scenario name -> position (for ordering results)
+        self._scenario_order = {name: i for i, name in enumerate(scenarios)}
 
         # Set up DataFrames for all trials results
         self.summary_output = pd.DataFrame()
@@ -28,6 +251,78 @@ class Replicator:
         self.summary_time_stamps_by_priority_pct_50 = pd.DataFrame()
         self.summary_time_stamps_by_priority_pct_95 = pd.DataFrame()
         self.summary_complete_in_24hrs = pd.DataFrame()
+        self.paired_differences = pd.DataFrame()
+        self.precision = pd.DataFrame()
+        self.selection = pd.DataFrame()
+        self.selected = None
+        # Whether results include runs forked from a shared warm up (see
+        # run_scenarios_from_warm_up)
+        self.forked = False
+        self.batch_means = pd.DataFrame()
+        self.pooled_queue_times = pd.DataFrame()
+        # Scenario name -> queue -> queue time quantile sketch (all runs)
+        self.queue_time_sketches = dict()
+
+        # Results pieces for each run (single run results key -> list of
+        # (scenario position, run), piece)
+        self._result_pieces = {key: [] for key in self.result_summaries}
+
+    def _check_independent_runs(self, mode):
+        """Raise ValueError if results include runs forked from a shared warm
+        up (`mode` needs independent runs)"""
+        if self.forked:
+            raise ValueError(f'{mode} needs independent runs: results include '
+                             'runs forked from a shared warm up')
+
+    def compare_scenarios(self, confidence=0.95):
+        """Paired differences of run KPIs between each scenario and the
+        baseline scenario (run i of a scenario is paired with run i of the
+        baseline), with confidence intervals. Most useful with common random
+        numbers, when pairing removes much of the run to run noise."""
+
+        if self.forked:
+            warnings.warn(FORKED_CAVEAT)
+
+        kpis = self.run_kpis()
+        names = list(self.scenarios)
+        baseline = self.baseline if self.baseline is not None else names[0]
+        baseline_kpis = kpis.loc[baseline]
+
+        records = []
+        for name in names:
+            if name == baseline:
+                continue
+            differences = kpis.loc[name] - baseline_kpis
+            for kpi in differences.columns:
+                mean, half_width = confidence_interval(differences[kpi],
+                                                       confidence)
+                records.append({'kpi': kpi,
+                                'name': name,
+                                'mean_difference': mean,
+                                'lower': mean - half_width,
+                                'upper': mean + half_width})
+
+        columns = ['kpi', 'name', 'mean_difference', 'lower', 'upper']
+        self.paired_differences = pd.DataFrame(records, columns=columns)
+        self.paired_differences.set_index(['kpi', 'name'], inplace=True)
+
+    def run_kpis(self):
+        """KPIs of each run: output summary results and proportion complete
+        in 24 hours by priority (index scenario name and run, one column per
+        KPI)."""
+
+        df = self.summary_output.copy()
+        df['kpi'] = df.index
+        kpis = df.pivot_table(index=['name', 'run'], columns='kpi',
+                              values='Result')
+
+        df = self.summary_complete_in_24hrs.copy()
+        df['kpi'] = ['complete_24_hrs_' + str(priority) for priority in
+                     df.index]
+        kpis = kpis.join(df.pivot_table(index=['name', 'run'], columns='kpi',
+                                        values='complete_24_hrs'))
+        kpis.columns.name = None
+        return kpis
 
     def pivot_results(self):
         """Summarise results across multiple scenario replicates. """
@@ -77,6 +372,16 @@ class Replicator:
             aggfunc = [np.median],
             margins=False)
         self.queue_times_pivot = self.queue_times_pivot['median']
+
+        # Queue times of all runs pooled (from merged quantile sketches)
+        pooled = []
+        for name, sketches in self.queue_time_sketches.items():
+            df = queue_time_summary(sketches)
+            df['name'] = name
+            pooled.append(df)
+        if len(pooled) > 0:
+            self.pooled_queue_times = pd.concat(pooled).set_index(
+                ['queue', 'name']).sort_index()
         
 
         # Max queue summary summary
@@ -89,7 +394,7 @@ class Replicator:
             aggfunc = [np.max, percentile_95],
             margins=False)
         self.max_queue_pivot.rename(columns={0:'Max samples'},inplace=True)
-        rows_to_drop = ['q_batch_input', 'q_completed']
+        rows_to_drop = ['q_batch_input', COMPLETED_QUEUE]
         self.max_queue_pivot.drop(rows_to_drop, inplace=True)
         
         # Tracker summery
@@ -269,6 +574,11 @@ class Replicator:
         print('-------------')
         print(self.queue_times_pivot[['median', 'max']])
         print('\n\n')
+        if len(self.pooled_queue_times) > 0:
+            print('Queuing times, all runs pooled')
+            print('------------------------------')
+            print(self.pooled_queue_times[['median', '95_percent', 'max']])
+            print('\n\n')
         print('Max samples queuing')
         print('-------------------')
         print('Results describe maximum queueing across runs')
@@ -290,26 +600,99 @@ class Replicator:
         print('---------------------------------')
         print(self.complete_in_24hr_pivot)
         print('\n\n')
+        if len(self.precision) > 0:
+            print('Relative precision of KPIs (CI half-width / mean)')
+            print('-------------------------------------------------')
+            print(self.precision.round(3))
+            if self.forked:
+                print(FORKED_CAVEAT)
+            print('\n\n')
+        if len(self.batch_means) > 0:
+            print('Batch means of daily results (single long run)')
+            print('----------------------------------------------')
+            print(self.batch_means.round(3))
+            print('\n\n')
+        if len(self.selection) > 0:
+            print('Scenario selection')
+            print('------------------')
+            print(self.selection.round(3))
+            print(f'Selected scenario: {self.selected}')
+            print('\n\n')
+        if self.crn and len(self.scenarios) > 1:
+            print('Paired differences from baseline (common random numbers)')
+            print('--------------------------------------------------------')
+            print(self.paired_differences.round(3))
+            if self.forked:
+                print(FORKED_CAVEAT)
+            print('\n\n')
 
 
-    def run_scenarios(self):
-        
-        # Run all scenarios
-        scenario_count = len(self.scenarios)
-        counter = 0
-        for name, scenario in self.scenarios.items():
-            counter += 1
-            print(
-                f'\r>> Running scenario {counter} of {scenario_count}', end='')
-            scenario_output = self.run_trial(scenario)
-            self.unpack_trial_results(name, scenario_output)
-        
-        # Clear progress output
-        clear_line = '\r' + " " * 79
-        print(clear_line, end = '')
+    def get_executor(self):
+        """Return pool of worker processes. The pool persists between calls,
+        so worker start up is paid once rather than for each scenario.
+        Scenarios are sent to each worker once, when it starts. Workers are
+        restarted if scenarios have changed (including changes in place)."""
+        fingerprint = scenarios_fingerprint(self.scenarios)
+        return get_reusable_executor(max_workers=self.worker_count(),
+                                     initializer=register_scenarios,
+                                     initargs=(self.scenarios, fingerprint))
+
+    def run_seed(self, name, run):
+        """Seed for a single run of a scenario. A run can be reproduced alone
+        with `Model(scenario, seed)`. With common random numbers the seed
+        depends only on the run."""
+        if self.crn:
+            return [self.seed, run]
+        position = self._scenario_order.get(name, len(self._scenario_order))
+        return [self.seed, position, run]
+
+    def kpi_precision(self, kpis, confidence=0.95):
+        """Relative precision (confidence interval half-width / mean) of run
+        KPIs for each scenario, with number of replications run. KPIs not in
+        run results are dropped. Precision is infinite with fewer than two
+        runs of a KPI, and NaN where it cannot be measured: a KPI the scenario
+        does not produce (e.g. no priority 2 arrivals), or a KPI with zero
+        mean that varies between runs (relative precision undefined)."""
+
+        if self.forked:
+            warnings.warn(FORKED_CAVEAT)
+
+        run_kpis = self.run_kpis()
+        kpis = [kpi for kpi in kpis if kpi in run_kpis.columns]
+        precision = pd.DataFrame(index=list(self.scenarios), columns=kpis,
+                                 dtype=float)
+        replications = dict()
+        for name in self.scenarios:
+            scenario_kpis = run_kpis.loc[name]
+            replications[name] = len(scenario_kpis)
+            for kpi in kpis:
+                values = scenario_kpis[kpi].dropna()
+                mean, half_width = confidence_interval(values, confidence)
+                if len(values) == 0:
+                    # KPI not produced by scenario
+                    precision.loc[name, kpi] = np.nan
+                elif len(values) < 2:
+                    precision.loc[name, kpi] = np.inf
+                elif half_width == 0:
+                    # No variation between runs
+                    precision.loc[name, kpi] = 0.0
+                elif mean == 0:
+                    precision.loc[name, kpi] = np.nan
+                else:
+                    precision.loc[name, kpi] = half_width / abs(mean)
+        precision['replications'] = pd.Series(replications)
+        return precision
+
+    def report_results(self):
+        """Combine, pivot, print, save and plot results of all runs"""
+
+        # Combine results of all runs
+        self.collate_results()
         
         # Pivot results
         self.pivot_results()
+        if len(self.scenarios) > 1:
+            self.compare_scenarios()
         
         # Print results
         self.print_results()
@@ -319,16 +702,371 @@ class Replicator:
         
         # Create charts
         self.plot_trackers()
+
+    def run_batch(self, runs):
+        """Run replications on the pool of workers. `runs` is a dictionary of
+        scenario name -> list of run numbers. Workers take the next run as
+        soon as they are free, so no workers are idle between scenarios.
+        Workers hold the scenarios, so tasks pass only scenario name, run and
+        seed."""
+
+        executor = self.get_executor()
+        futures = dict()
+        for name, scenario_runs in runs.items():
+            for run in scenario_runs:
+                future = executor.submit(registered_run_record, name, run,
+                                         self.run_seed(name, run))
+                futures[future] = (name, run)
+
+        # Collect encoded results as runs complete
+        records = {name: dict() for name in runs}
+        task_count = len(futures)
+        for counter, future in enumerate(as_completed(futures), 1):
+            print(f'\r>> Completed run {counter} of {task_count}', end='')
+            name, run = futures.pop(future)
+            records[name][run], sketches = future.result()
+            self.merge_queue_time_sketches(name, sketches)
+
+        # Decode results of all runs of each scenario at once
+        for name, scenario_runs in runs.items():
+            if len(scenario_runs) == 0:
+                continue
+            arrays = np.vstack([records[name][run] for run in scenario_runs])
+            results = ResultSchema(self.scenarios[name]).decode_runs(
+                arrays, name, scenario_runs)
+            self.unpack_scenario_results(name, results, scenario_runs[0])
+
+        # Clear progress output
+        clear_line = '\r' + " " * 79
+        print(clear_line, end = '')
+
+    def worker_count(self):
+        """Number of worker processes"""
+        n_jobs = self.n_jobs
+        if n_jobs < 0:
+            n_jobs = max(cpu_count() + 1 + n_jobs, 1)
+        return n_jobs
+
+    def run_scenarios(self):
         
+        # Run all scenario replications on one pool of workers
+        self.run_batch({name: list(range(self.replications)) for name in
+                        self.scenarios})
         
-    
-    def run_trial(self, scenario):
-        trial_output = Parallel(n_jobs=-1)(delayed(self.single_run)(scenario, i) 
-                for i in range(self.replications))
-        
-        return trial_output
-        
-    
+        self.report_results()
+
+    def run_scenarios_from_warm_up(self):
+        """Run replications of each scenario forked from a single warm up of
+        the scenario (see `forked_run_records`; POSIX only), so the warm up is
+        simulated once per scenario rather than once per run. Forked runs
+        run in parallel in up to `n_jobs` processes. Run i uses the same seed
+        as in `run_scenarios` after warm up.
+
+        Runs share the warm up state, so they are not independent samples.
+        Results are marked as forked (`forked`): confidence intervals are
+        reported with a caveat, and adaptive replication and selection, which
+        rely on independent runs, are refused."""
+
+        self.forked = True
+        for name, scenario in self.scenarios.items():
+            runs = list(range(self.replications))
+            records = forked_run_records(
+                scenario,
+                [self.run_seed(name, run) for run in runs],
+                warm_up_seed=self.run_seed(name, WARM_UP_RUN),
+                n_jobs=self.worker_count())
+            for _array, sketches in records:
+                self.merge_queue_time_sketches(name, sketches)
+            results = ResultSchema(scenario).decode_runs(
+                np.vstack([array for array, _sketches in records]), name,
+                runs)
+            self.unpack_scenario_results(name, results)
+
+        self.report_results()
+
+    def run_scenarios_batch_means(self, run_days=None, kpis=None,
+                                  confidence=0.95, min_batches=10,
+                                  max_autocorrelation=0.2):
+        """
+        Estimate KPIs from one long run of each scenario (one warm up per
+        scenario), using non-overlapping batch means of daily results (see
+        `helper_functions.batch_means`). Batch size is chosen automatically
+        so that the lag-1 autocorrelation of batch means is no more than
+        `max_autocorrelation`; if this cannot be met with `min_batches`
+        batches the result is flagged as not independent, and a longer run is
+        needed. Suited to steady state questions (e.g. capacity).
+
+        Other results are reported as for a single run of each scenario.
+
+        Parameters
+        ----------
+        run_days : int
+            Days run after warm up (default `replications` x scenario run
+            days, the same days of results as independent replications)
+        kpis : list
+            Daily results estimated (default `batch_means_kpis`)
+        confidence : float
+            Confidence level of confidence intervals
+        min_batches : int
+            Smallest number of batches
+        max_autocorrelation : float
+            Largest lag-1 autocorrelation of batch means accepted
+
+        Returns
+        -------
+        None.
+
+        """
+
+        if kpis is None:
+            kpis = self.batch_means_kpis
+
+        # One long run of each scenario, on the pool of workers
+        long_scenarios = dict()
+        for name, scenario in self.scenarios.items():
+            long_scenarios[name] = copy.deepcopy(scenario)
+            days = run_days if run_days is not None else \
+                self.replications * scenario.run_days
+            long_scenarios[name].set_run_days(days)
+        executor = self.get_executor()
+        futures = {name: executor.submit(single_run_record, scenario, 0,
+                                         self.run_seed(name, 0))
+                   for name, scenario in long_scenarios.items()}
+
+        records = []
+        for name, scenario in long_scenarios.items():
+            array, sketches = futures[name].result()
+            self.merge_queue_time_sketches(name, sketches)
+            results = ResultSchema(scenario).decode_runs(array, name)
+            self.unpack_scenario_results(name, results)
+
+            output_by_day = results['output_by_day']
+            for kpi in kpis:
+                means, batch_size, autocorrelation = batch_means(
+                    output_by_day[kpi], min_batches, max_autocorrelation)
+                mean, half_width = confidence_interval(means, confidence)
+                records.append({'name': name,
+                                'kpi': kpi,
+                                'mean': mean,
+                                'lower': mean - half_width,
+                                'upper': mean + half_width,
+                                'batch_size': batch_size,
+                                'batches': len(means),
+                                'autocorrelation': autocorrelation,
+                                'independent': not (autocorrelation >
+                                                    max_autocorrelation)})
+
+        columns = ['kpi', 'name', 'mean', 'lower', 'upper', 'batch_size',
+                   'batches', 'autocorrelation', 'independent']
+        self.batch_means = pd.DataFrame(records, columns=columns)
+        self.batch_means.set_index(['kpi', 'name'], inplace=True)
+
+        self.report_results()
+
+    def run_scenarios_adaptive(self, kpis=None, relative_precision=0.05,
+                               max_replications=100, confidence=0.95):
+        """
+        Run replications in batches (of `replications` runs) until the
+        confidence interval half-width of each KPI is within
+        `relative_precision` of its mean, or `max_replications` runs have been
+        made. Each scenario stops independently, so replications go to the
+        scenarios that need them. KPIs not produced by a scenario, or with
+        zero mean that varies between runs, cannot be given a relative
+        precision and are not checked for that scenario (see
+        `kpi_precision`).
+
+        Parameters
+        ----------
+        kpis : list
+            Run KPIs to check (columns of `run_kpis`; default `adaptive_kpis`)
+        relative_precision : float
+            Target confidence interval half-width, as a proportion of mean
+        max_replications : int
+            Maximum replications of any scenario
+        confidence : float
+            Confidence level of confidence intervals
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self._check_independent_runs('Adaptive replication')
+        kpis = list(kpis) if kpis is not None else list(self.adaptive_kpis)
+        replications_run = {name: 0 for name in self.scenarios}
+        active = list(self.scenarios)
+
+        while len(active) > 0:
+            batch = dict()
+            for name in active:
+                first_run = replications_run[name]
+                last_run = min(first_run + self.replications, max_replications)
+                batch[name] = list(range(first_run, last_run))
+                replications_run[name] = last_run
+            self.run_batch(batch)
+
+            # Check precision
+            self.collate_results()
+            self.precision = self.kpi_precision(kpis, confidence)
+            precision = self.precision.drop(columns='replications')
+            # KPIs whose precision cannot be measured (NaN) are not checked
+            converged = ((precision <= relative_precision) |
+                         precision.isna()).all(axis=1)
+            active = [name for name in active if not converged[name] and
+                      replications_run[name] < max_replications]
+
+        self.report_results()
+
+    def run_selection(self, kpi='complete_24_hrs_All', threshold=None,
+                      costs=None, maximise=True, confidence=0.95, budget=200,
+                      increment=None):
+        """
+        Ranking and selection of scenarios. All scenarios get `replications`
+        runs first. Further runs are then made in rounds of `increment` runs
+        (default number of workers), allocated to the scenarios whose ranking
+        is still uncertain, using running means and standard deviations of
+        `kpi`, until the selection is made at the given confidence or
+        `budget` runs (in total) have been made.
+
+        Without a threshold the scenario with the best mean KPI is selected,
+        with runs allocated by OCBA.
+
+        With a threshold the cheapest scenario whose mean KPI meets the
+        threshold (>= threshold if `maximise`, otherwise <=) is selected.
+        A scenario is decided feasible or infeasible when its confidence
+        interval lies wholly above or below the threshold, and runs go only to
+        undecided scenarios that could be cheaper than the cheapest feasible
+        scenario found.
+
+        Parameters
+        ----------
+        kpi : string
+            Run KPI (column of `run_kpis`)
+        threshold : float
+            KPI threshold for feasibility (None: select best KPI)
+        costs : dictionary
+            Scenario name -> cost (default total number of resources,
+            excluding trackers and dummy resources)
+        maximise : bool
+            Higher KPI is better
+        confidence : float
+            Confidence of selection
+        budget : int
+            Maximum total runs (all scenarios)
+        increment : int
+            Runs allocated in each round
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self._check_independent_runs('Selection')
+        names = list(self.scenarios)
+        if costs is None:
+            costs = {name: self.scenario_cost(name) for name in names}
+        if increment is None:
+            increment = self.worker_count()
+
+        replications_run = {name: 0 for name in names}
+        runs = {name: self.replications for name in names}
+
+        while True:
+            batch = dict()
+            for name in names:
+                first_run = replications_run[name]
+                batch[name] = list(range(first_run, first_run + runs[name]))
+                replications_run[name] += runs[name]
+            self.run_batch(batch)
+            self.collate_results()
+
+            # KPI statistics by scenario
+            stats = self.run_kpis()[kpi].groupby(level='name').agg(
+                ['mean', 'std', 'count']).loc[names]
+            stats['cost'] = pd.Series(costs)
+            means = stats['mean'].values
+            stds = stats['std'].fillna(0).values
+            counts = stats['count'].values
+
+            if threshold is None:
+                probability = probability_correct_selection(
+                    means, stds, counts, maximise)
+                stats['best'] = False
+                best = np.argmax(means) if maximise else np.argmin(means)
+                stats.iloc[best, stats.columns.get_loc('best')] = True
+                self.selected = names[best]
+                finished = probability >= confidence
+            else:
+                stats['status'] = [
+                    self.feasibility(self.run_kpis().loc[name, kpi],
+                                     threshold, maximise, confidence)
+                    for name in names]
+                self.selected, candidates = self.select_cheapest_feasible(
+                    stats)
+                finished = not candidates.any()
+
+            self.selection = stats
+            remaining = budget - sum(replications_run.values())
+            if finished or remaining <= 0:
+                break
+
+            round_increment = min(increment, remaining)
+            if threshold is None:
+                allocation = ocba_allocation(means, stds, counts,
+                                             round_increment, maximise)
+            else:
+                allocation = constrained_allocation(
+                    means, stds, threshold, round_increment, candidates)
+            runs = dict(zip(names, allocation.tolist()))
+
+        self.report_results()
+
+    def scenario_cost(self, name):
+        """Default scenario cost: total number of resources (excluding
+        trackers and dummy resources)"""
+        return sum(number for resource, number in
+                   self.scenarios[name].resource_numbers.items()
+                   if resource[0:7] != 'tracker' and resource != 'dummy')
+
+    @staticmethod
+    def feasibility(values, threshold, maximise=True, confidence=0.95):
+        """Feasibility of a scenario from run KPI values: 'feasible' or
+        'infeasible' if the confidence interval of the mean is wholly on one
+        side of the threshold, otherwise 'undecided'."""
+        mean, half_width = confidence_interval(values, confidence)
+        if np.isnan(half_width):
+            return 'undecided'
+        lower, upper = mean - half_width, mean + half_width
+        if not maximise:
+            lower, upper, threshold = -upper, -lower, -threshold
+        if lower >= threshold:
+            return 'feasible'
+        if upper < threshold:
+            return 'infeasible'
+        return 'undecided'
+
+    @staticmethod
+    def select_cheapest_feasible(stats):
+        """Return cheapest feasible scenario (None if not yet identified),
+        and whether each scenario (in order of `stats`) should get more runs.
+        The selection is made when the cheapest feasible scenario has no
+        cheaper scenario that is undecided."""
+        order = stats.sort_values('cost', kind='stable')
+        feasible = order[order['status'] == 'feasible']
+        undecided = stats['status'] == 'undecided'
+
+        if len(feasible) == 0:
+            # Keep testing all undecided scenarios
+            return None, undecided.values
+
+        cheapest_feasible = feasible.index[0]
+        cost = feasible['cost'].iloc[0]
+        candidates = undecided & (stats['cost'] < cost)
+        selected = cheapest_feasible if not candidates.any() else None
+        return selected, candidates.values
+
     def save_results(self):
         
         self.summary_output.to_csv('./output/output.csv')
@@ -344,100 +1082,35 @@ class Replicator:
         self.resources_pivot.to_csv('./output/resources.summary.csv')
     
     
-    def single_run(self, scenario, i=0):
-        print(f'{i}, ', end='' )
-        model = Model(scenario)
-        model.run()
-        
-        # Put results in a dictionary
-        results = {
-            'output': model.process.audit.summary_output,
-            'output_by_day': model.process.audit.summary_output_by_day,
-            'resources': model.process.audit.summary_resources,
-            'max_queues': model.process.audit.max_queue_sizes,
-            'queue_times': model.process.audit.queue_times,
-            'tracker': model.process.audit.tracker_results,
-            'time_stamps': model.process.audit.time_stamp_medians,
-            'time_stamp_by_priority_pct_50':
-                model.process.audit.time_stamp_by_priority_pct_50,
-            'time_stamp_by_priority_pct_95':
-                model.process.audit.time_stamp_by_priority_pct_95,
-            'complete_in_24hrs': model.process.audit.complete_in_24hrs
-                   }
-        
-        return results
+    def single_run(self, scenario, i=0, seed=None):
+        return single_run(scenario, i, seed)
 
 
-    def unpack_trial_results(self, name, results):
+    def collate_results(self):
+        """Concatenate results pieces of all runs (once for each summary), in
+        scenario and run order"""
+        for key, pieces in self._result_pieces.items():
+            if len(pieces) > 0:
+                pieces = [piece for _order, piece in
+                          sorted(pieces, key=lambda item: item[0])]
+                setattr(self, self.result_summaries[key], pd.concat(pieces))
+
+    def merge_queue_time_sketches(self, name, sketches):
+        """Merge queue time quantile sketches of a run into the sketches of
+        all runs of a scenario"""
+        scenario_sketches = self.queue_time_sketches.setdefault(name, dict())
+        for queue, sketch in sketches.items():
+            if queue not in scenario_sketches:
+                scenario_sketches[queue] = QuantileSketch(
+                    sketch.relative_accuracy)
+            scenario_sketches[queue].merge(sketch)
+
+    def unpack_scenario_results(self, name, results, first_run=0):
+        """Add results of runs of a scenario, already combined into one
+        DataFrame for each results key (see ResultSchema.decode_runs)"""
+
+        order = (self._scenario_order.get(name, len(self._scenario_order)),
+                 first_run)
+        for key, pieces in self._result_pieces.items():
+            pieces.append((order, results[key]))
 
-        for run in range(self.replications):
-            
-            # Output summary
-            result_item = results[run]['output']
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_output = self.summary_output.append(result_item)
-            
-            # Output by day summary
-            result_item = results[run]['output_by_day']
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_output_by_day = \
-                self.summary_output_by_day.append(result_item)
-            
-            # Resources summary
-            result_item = results[run]['resources']
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_resources = self.summary_resources.append(result_item)
-            
-            # Max queue summary (convert from series)
-            result_item = pd.DataFrame(results[run]['max_queues'])
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_max_queues = \
-                self.summary_max_queues.append(result_item)
-            
-            # Queueing time summary
-            result_item = pd.DataFrame(results[run]['queue_times'])
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_queue_times = \
-                self.summary_queue_times.append(result_item)
-                
-            # Resource tracker
-            result_item = pd.DataFrame(results[run]['tracker'])
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_tracker = \
-                self.summary_tracker.append(result_item)
-
-            # Time stamps summaries (medians)
-            result_item = pd.DataFrame(results[run]['time_stamps'])
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_time_stamps = \
-                self.summary_time_stamps.append(result_item)
-
-            # Time stamps by priority
-            result_item = pd.DataFrame(
-                results[run]['time_stamp_by_priority_pct_50'])
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_time_stamps_by_priority_pct_50 = \
-                self.summary_time_stamps_by_priority_pct_50.append(result_item)
-
-            result_item = pd.DataFrame(
-                results[run]['time_stamp_by_priority_pct_95'])
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_time_stamps_by_priority_pct_95 = \
-                self.summary_time_stamps_by_priority_pct_95.append(result_item)
-
-            # Complete in 24 hours by priority
-            result_item = pd.DataFrame(
-                results[run]['complete_in_24hrs'])
-            result_item['run'] = run
-            result_item['name'] = name
-            self.summary_complete_in_24hrs = \
-                self.summary_complete_in_24hrs.append(result_item)
\ No newline at end of file
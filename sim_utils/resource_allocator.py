@@ -0,0 +1,138 @@
+import heapq
+
+
+class ResourceAllocator:
+    """
+    All-or-nothing allocation of resources for process steps.
+
+    A job asks for a tuple of resource groups (e.g. the `human_list` and
+    `machine_list` tuples in scenario process resources). Each group is a list
+    of alternative resources, and one resource is needed from every group. If
+    all groups can be satisfied the resources are allocated at once; if not,
+    the job is parked until resources are released or a shift starts (the
+    roster opens a resource pool). Parked jobs are then checked in priority
+    order (lower number -> higher priority).
+
+    Parked jobs are grouped by the resources they require, so each wake-up
+    checks resource availability once per distinct group of resources rather
+    than once per waiting job.
+
+    Resources are identified by their ScenarioPlan resource ids.
+
+    Methods
+    -------
+    acquire:
+        Returns a SimPy event that succeeds with the list of selected resources
+        (one per group) once all resource groups can be satisfied.
+
+    check_availability:
+        Checks whether all resource groups can currently be satisfied.
+
+    release:
+        Returns resources to the pool and wakes any waiting jobs.
+
+    wake:
+        Allocates resources to waiting jobs that can now be satisfied.
+
+    """
+
+    def __init__(self, _process):
+
+        self._env = _process._env
+        self._params = _process._params
+        self._resources_available = _process.resources_available
+        self._resources_occupied = _process.resources_occupied
+        self._resources_on_shift = _process.resources_on_shift
+        self._request_order = 0
+        # Dictionary of resource groups required -> heap of waiting jobs
+        self._waiting = dict()
+
+    def acquire(self, resources_required, priority):
+        """Returns event that succeeds with selected resources (one per
+        resource group) when all resource groups can be satisfied. Resource
+        groups are a tuple of tuples of resource ids."""
+
+        event = self._env.event()
+        all_resources_found, resources_selected = \
+            self.check_availability(resources_required)
+
+        if all_resources_found:
+            self.occupy(resources_selected)
+            event.succeed(resources_selected)
+        else:
+            # Park job until resources are released or a shift starts
+            self._request_order += 1
+            waiting = self._waiting.setdefault(resources_required, [])
+            heapq.heappush(waiting, (priority, self._request_order, event))
+
+        return event
+
+    def check_availability(self, resources_required):
+        """Look for one available, on-shift, resource from each group. The
+        same resource may be selected by more than one group only if enough
+        of that resource is available."""
+
+        resources_selected = []  # ids of selected resources
+
+        # Look through all resources required
+        for resource_list in resources_required:
+            # Check availability of alternative resources
+            for resource in resource_list:
+                # Check whether resource pool is open (on shift)
+                shift_available = self._resources_on_shift[resource]
+                # Check number of resources available (allow for resources
+                # already selected for an earlier group)
+                available = (self._resources_available[resource] -
+                             resources_selected.count(resource))
+                if shift_available and available > 0:
+                    resources_selected.append(resource)
+                    break
+            else:
+                # No resource found for this group
+                return (False, resources_selected)
+
+        return (True, resources_selected)
+
+    def occupy(self, resources):
+        """Adjust resource counts for resources taken."""
+        for resource in resources:
+            self._resources_available[resource] -= 1
+            self._resources_occupied[resource] += 1
+
+    def release(self, resources):
+        """Adjust resource counts for resources returned, and wake any jobs
+        waiting for resources."""
+        for resource in resources:
+            self._resources_available[resource] += 1
+            self._resources_occupied[resource] -= 1
+        self.wake()
+
+    def wake(self):
+        """Allocate resources to waiting jobs in priority order. Once a group
+        of resources cannot be satisfied no more jobs needing that group are
+        checked (allocation only reduces resources available)."""
+
+        blocked = set()
+        while True:
+            # Find highest priority waiting job among groups not blocked
+            best_key = None
+            best_job = None
+            for key, waiting in self._waiting.items():
+                if waiting and key not in blocked:
+                    if best_job is None or waiting[0] < best_job:
+                        best_key = key
+                        best_job = waiting[0]
+
+            if best_key is None:
+                # No more jobs can be allocated resources
+                return
+
+            all_resources_found, resources_selected = \
+                self.check_availability(best_key)
+
+            if all_resources_found:
+                heapq.heappop(self._waiting[best_key])
+                self.occupy(resources_selected)
+                best_job[2].succeed(resources_selected)
+            else:
+                blocked.add(best_key)
@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+from sim_utils.audit import COMPLETED_QUEUE
+from sim_utils.completion_sink import TIME_STAMP_FIELDS
+from sim_utils.plan import QUEUE_NAMES
+
+# Entity priorities reported (high priority = 1)
+PRIORITIES = (1, 2)
+
+OUTPUT_RESULTS = ['input', 'output', 'demand_met',
+                  'median_process_time_hours', 'max_process_time_hours']
+
+QUEUE_TIME_RESULTS = ['min', '1Q', 'median', '3Q', '95_percent', 'max']
+
+
+class ResultSchema:
+    """
+    Fixed layout of the results of a single model run as one flat NumPy
+    array. Worker processes return the encoded array rather than the
+    dictionary of pandas objects, and the parent decodes it back into the same
+    pandas objects. The layout depends only on the scenario (resources, run
+    days, queues, time stamps and priorities), so worker and parent build the
+    same schema independently.
+
+    Each results item is held as a table (row labels x column labels) in the
+    array. Results not present in a run (e.g. a queue never used) are NaN and
+    are dropped when decoded.
+
+    Attributes
+    ----------
+    dtype: NumPy data type of encoded results
+    size: Number of values in encoded results (int)
+    tables: List of (results key, row labels, column labels)
+
+    Methods
+    -------
+    decode:
+        Convert encoded array to dictionary of results (pandas objects)
+
+    decode_runs:
+        Convert encoded arrays of several runs to dictionary of results
+        (pandas objects combining all runs)
+
+    encode:
+        Convert dictionary of results to encoded array
+
+    """
+
+    def __init__(self, scenario, dtype=np.float64):
+        """
+        Constructor method for results schema
+
+        Parameters
+        ----------
+        scenario : Scenario
+            Scenario that results are from
+        dtype : NumPy data type
+            Data type of encoded results (float32 halves size, but holds
+            results only to about 7 significant figures)
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.dtype = dtype
+
+        resources = [resource for resource, number in
+                     scenario.resource_numbers.items() if number > 0]
+        trackers = [resource for resource in resources if
+                    resource[0:7] == 'tracker'] + ['tracker_break_fte']
+        resources = [resource for resource in resources if
+                     resource[0:7] != 'tracker']
+        queues = list(QUEUE_NAMES) + [COMPLETED_QUEUE]
+        days = list(range(1, scenario.result_days + 1))
+        time_stamps_by_priority = (list(TIME_STAMP_FIELDS), list(PRIORITIES))
+
+        self.tables = [
+            ('output', OUTPUT_RESULTS + ['warm_up_days'], ['Result']),
+            ('output_by_day', days, OUTPUT_RESULTS),
+            ('resources', resources, ['Available', 'Used', 'Utilisation']),
+            ('max_queues', queues, [0]),
+            ('queue_times', queues, QUEUE_TIME_RESULTS),
+            ('tracker', list(range(24)), trackers),
+            ('time_stamps', list(TIME_STAMP_FIELDS), ['median']),
+            ('time_stamp_by_priority_pct_50',) + time_stamps_by_priority,
+            ('time_stamp_by_priority_pct_95',) + time_stamps_by_priority,
+            ('complete_in_24hrs', list(PRIORITIES) + ['All'],
+             ['complete_24_hrs'])
+        ]
+
+        self._slices = dict()
+        start = 0
+        for key, rows, columns in self.tables:
+            end = start + len(rows) * len(columns)
+            self._slices[key] = (start, end)
+            start = end
+        self.size = start
+
+    def decode(self, array):
+        """Decode results of a single run"""
+        return self._decode(np.atleast_2d(array))
+
+    def decode_runs(self, arrays, name, runs=None):
+        """Decode results of several runs (rows of `arrays`) of a scenario into
+        one DataFrame for each results item, with 'run' and 'name' columns
+        added (as in Replicator summaries)"""
+        arrays = np.atleast_2d(arrays)
+        if runs is None:
+            runs = np.arange(arrays.shape[0])
+        return self._decode(arrays, np.asarray(runs), name)
+
+    def encode(self, results):
+        array = np.full(self.size, np.nan, dtype=self.dtype)
+        for key, rows, columns in self.tables:
+            start, end = self._slices[key]
+            table = self._to_table(key, results[key], columns)
+            table = table.reindex(index=rows, columns=columns)
+            array[start:end] = table.to_numpy(dtype=np.float64).ravel()
+        return array
+
+    def _decode(self, arrays, runs=None, name=None):
+        results = dict()
+        for key, rows, columns in self.tables:
+            start, end = self._slices[key]
+            values = arrays[:, start:end].astype(np.float64).reshape(
+                arrays.shape[0], len(rows), len(columns))
+            results[key] = self._from_tables(key, values, rows, columns, runs,
+                                             name)
+        return results
+
+    def _from_tables(self, key, values, rows, columns, runs, name):
+        """Convert table values (runs x rows x columns) to form of single run
+        results. If run numbers are given, results of all runs are combined
+        and 'run' and 'name' columns added."""
+        run_count, row_count, column_count = values.shape
+
+        if key in ('max_queues', 'time_stamps'):
+            series_name = columns[0] if key == 'time_stamps' else None
+            if runs is None:
+                return pd.Series(values[0, :, 0], index=rows, name=series_name)
+            table = pd.DataFrame({columns[0]: values[:, :, 0].ravel()},
+                                 index=rows * run_count)
+            table_runs = np.repeat(runs, row_count)
+
+        elif key[0:23] == 'time_stamp_by_priority_':
+            # One block of time stamps for each priority present in a run
+            run_ids, column_ids = np.nonzero(~np.isnan(values).all(axis=1))
+            table = pd.DataFrame(
+                {'priority': np.repeat(np.array(columns)[column_ids],
+                                       row_count),
+                 'value': values[run_ids, :, column_ids].ravel()},
+                index=pd.Index(rows * len(run_ids), name='process'))
+            table_runs = None if runs is None else np.repeat(runs[run_ids],
+                                                             row_count)
+
+        else:
+            if key == 'output_by_day':
+                values = self._days_run(values, columns)
+            # Remove rows not present in results
+            values = values.reshape(run_count * row_count, column_count)
+            keep = ~np.isnan(values).all(axis=1)
+            index = pd.Index([row for row, present in
+                              zip(rows * run_count, keep) if present])
+            table = pd.DataFrame(values[keep], index=index, columns=columns)
+            table_runs = None if runs is None else np.repeat(
+                runs, row_count)[keep]
+
+            if key == 'output_by_day':
+                table[['input', 'output']] = \
+                    table[['input', 'output']].astype(int)
+            elif key == 'queue_times':
+                # Queue as column, with index numbered from zero in each run
+                table.index.name = 'queue'
+                table = table.reset_index()
+                run_lengths = keep.reshape(run_count, row_count).sum(axis=1)
+                table.index = np.concatenate(
+                    [np.arange(length) for length in run_lengths])
+            elif key == 'tracker':
+                table.index.name = 'hour'
+            elif key == 'complete_in_24hrs':
+                table.index.name = 'priority'
+
+        if runs is not None:
+            table['run'] = table_runs
+            table['name'] = name
+        return table
+
+    @staticmethod
+    def _days_run(values, columns):
+        """Output by day values (runs x days x columns) with days not run
+        (after the last day with input, e.g. after an early stop) set to NaN,
+        and missing counts on days run set to zero (days without output have
+        no count)"""
+        values = values.copy()
+        has_input = ~np.isnan(values[:, :, columns.index('input')])
+        days_run = np.where(has_input.any(axis=1),
+                            values.shape[1] - np.argmax(has_input[:, ::-1],
+                                                        axis=1), 0)
+        not_run = np.arange(values.shape[1]) >= days_run[:, np.newaxis]
+        values[not_run] = np.nan
+        for column in ('input', 'output'):
+            counts = values[:, :, columns.index(column)]
+            counts[~not_run & np.isnan(counts)] = 0
+        return values
+
+    def _to_table(self, key, result, columns):
+        """Convert single run result to table"""
+        if isinstance(result, pd.Series):
+            return result.to_frame(name=columns[0])
+        if key[0:23] == 'time_stamp_by_priority_':
+            return result.reset_index().pivot(
+                index='process', columns='priority', values='value')
+        if key == 'queue_times':
+            return result.set_index('queue')
+        return result
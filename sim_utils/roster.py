@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class Roster:
+    """
+    Resource roster. Opens and closes resource pools at shift starts and ends.
+
+    Shift changes are taken from the ScenarioPlan resource timetable. One
+    event is scheduled for each time in the roster when any resource starts
+    or ends a shift. Resource pools are opened or closed by setting their
+    on-shift state (also held by each resource, for exact utilisation), and
+    jobs waiting for resources are woken only when a pool opens, so periods
+    without shift changes need no events.
+
+    Attributes
+    ----------
+    shift_changes: List of (minute in roster, resource ids opening, resource
+        ids closing)
+
+    Methods
+    -------
+    run:
+        Continuous loop of shift changes (SimPy process)
+
+    """
+
+    def __init__(self, _process):
+
+        self._env = _process._env
+        self._plan = _process._plan
+        self._allocator = _process.resource_allocator
+        self._request_dispatch = _process.request_dispatch
+        self._resources_on_shift = _process.resources_on_shift
+        self._resource_list = _process.resource_list
+
+        # Resources opening and closing at each shift change
+        timetable = self._plan.resource_timetable
+        self.shift_changes = []
+        for minute in self._plan.shift_change_minutes.tolist():
+            on_shift = timetable[:, minute]
+            previously_on_shift = timetable[:, minute - 1]
+            opening = np.flatnonzero(on_shift & ~previously_on_shift).tolist()
+            closing = np.flatnonzero(~on_shift & previously_on_shift).tolist()
+            self.shift_changes.append((minute, opening, closing))
+
+    def run(self):
+        """Continuous loop of shift changes. Closing pools stops new work
+        being allocated (work in progress is completed). Opening pools wakes
+        jobs waiting for resources."""
+        if not self.shift_changes:
+            # All resources on shift all of the time
+            return
+
+        roster_start = 0
+        while True:
+            for minute, opening, closing in self.shift_changes:
+                delay = roster_start + minute - self._env.now
+                if delay < 0:
+                    continue
+                if delay > 0:
+                    yield self._env.timeout(delay)
+
+                for resource in closing:
+                    self._resources_on_shift[resource] = False
+                    self._set_on_shift(resource, False)
+                for resource in opening:
+                    self._resources_on_shift[resource] = True
+                    self._set_on_shift(resource, True)
+
+                if opening:
+                    self._allocator.wake()
+                    self._request_dispatch()
+
+            roster_start += self._plan.roster_minutes
+
+    def _set_on_shift(self, resource, on_shift):
+        """Update on-shift time tracking of resource pool (if present)"""
+        resource_object = self._resource_list[resource]
+        if resource_object is not None:
+            resource_object.set_on_shift(on_shift)
@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+
+# Smallest difference / standard deviation used (avoids division by zero)
+_TINY = 1e-9
+
+
+def allocate(weights, increment):
+    """
+    Share `increment` runs in proportion to weights (largest remainder).
+
+    Parameters
+    ----------
+    weights : array-like
+        Non-negative weights
+    increment : int
+        Number of runs to allocate
+
+    Returns
+    -------
+    NumPy array of ints (runs for each weight)
+
+    """
+
+    weights = np.asarray(weights, dtype=float)
+    if weights.sum() <= 0:
+        weights = np.ones_like(weights)
+    shares = increment * weights / weights.sum()
+    runs = np.floor(shares).astype(int)
+    remainder = increment - runs.sum()
+    if remainder > 0:
+        order = np.argsort(-(shares - runs), kind='stable')
+        runs[order[:remainder]] += 1
+    return runs
+
+
+def constrained_allocation(means, stds, threshold, increment, candidates):
+    """
+    Allocation of further runs when looking for scenarios that meet a
+    threshold (feasibility). Runs go to candidate scenarios whose
+    feasibility is not yet decided, in proportion to (standard deviation /
+    distance of mean from threshold) squared, so scenarios close to the
+    threshold or noisy get most runs.
+
+    Parameters
+    ----------
+    means, stds : array-like
+        Running mean and standard deviation of KPI, by scenario
+    threshold : float
+        KPI threshold for feasibility
+    increment : int
+        Number of runs to allocate
+    candidates : array-like of bool
+        Scenarios that may receive runs
+
+    Returns
+    -------
+    NumPy array of ints (further runs for each scenario)
+
+    """
+
+    means = np.asarray(means, dtype=float)
+    stds = np.maximum(np.asarray(stds, dtype=float), _TINY)
+    candidates = np.asarray(candidates, dtype=bool)
+    distance = np.maximum(np.abs(means - threshold), _TINY)
+    weights = np.where(candidates, (stds / distance) ** 2, 0.0)
+    if weights.sum() <= 0:
+        weights = candidates.astype(float)
+    return allocate(weights, increment)
+
+
+def ocba_allocation(means, stds, counts, increment, maximise=True):
+    """
+    Optimal computing budget allocation (OCBA) of further runs for selecting
+    the best scenario. Target run numbers follow the OCBA ratios: for
+    non-best scenarios N_i proportional to (s_i / d_i)^2, where d_i is the
+    difference in mean from the best, and for the best scenario
+    N_b = s_b * sqrt(sum(N_i^2 / s_i^2)). Further runs go to the scenarios
+    furthest below their target.
+
+    Parameters
+    ----------
+    means, stds, counts : array-like
+        Running mean, standard deviation and number of runs of KPI, by
+        scenario
+    increment : int
+        Number of runs to allocate
+    maximise : bool
+        Best scenario has highest (True) or lowest (False) mean
+
+    Returns
+    -------
+    NumPy array of ints (further runs for each scenario)
+
+    """
+
+    means = np.asarray(means, dtype=float)
+    stds = np.maximum(np.asarray(stds, dtype=float), _TINY)
+    counts = np.asarray(counts, dtype=float)
+    best = np.argmax(means) if maximise else np.argmin(means)
+
+    ratios = np.zeros(len(means))
+    others = np.arange(len(means)) != best
+    differences = np.maximum(np.abs(means[best] - means[others]), _TINY)
+    ratios[others] = (stds[others] / differences) ** 2
+    ratios[best] = stds[best] * math.sqrt(
+        np.sum(ratios[others] ** 2 / stds[others] ** 2))
+
+    total = counts.sum() + increment
+    targets = total * ratios / ratios.sum()
+    return allocate(np.maximum(targets - counts, 0.0), increment)
+
+
+def probability_correct_selection(means, stds, counts, maximise=True):
+    """
+    Approximate probability that the scenario with the best running mean is
+    the best scenario (Bonferroni bound with normal approximation for the
+    difference between the best and each other scenario).
+
+    Parameters
+    ----------
+    means, stds, counts : array-like
+        Running mean, standard deviation and number of runs of KPI, by
+        scenario
+    maximise : bool
+        Best scenario has highest (True) or lowest (False) mean
+
+    Returns
+    -------
+    float
+
+    """
+
+    means = np.asarray(means, dtype=float)
+    variances = np.asarray(stds, dtype=float) ** 2
+    counts = np.asarray(counts, dtype=float)
+    best = np.argmax(means) if maximise else np.argmin(means)
+
+    probability_wrong = 0.0
+    for i in range(len(means)):
+        if i == best:
+            continue
+        standard_error = math.sqrt(variances[best] / counts[best] +
+                                   variances[i] / counts[i])
+        difference = abs(means[best] - means[i])
+        if standard_error == 0:
+            # No noise: wrong only if means are equal
+            probability_wrong += 0.5 if difference == 0 else 0.0
+            continue
+        z = difference / standard_error
+        probability_wrong += 0.5 * math.erfc(z / math.sqrt(2))
+
+    return max(1.0 - probability_wrong, 0.0)
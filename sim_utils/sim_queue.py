@@ -0,0 +1,155 @@
+import heapq
+
+
+class SimQueue:
+    """
+    Priority queue for simulation entities (single-threaded; no locking).
+
+    Items are (priority, entity) tuples, as previously used with
+    queue.PriorityQueue. Lower priority numbers leave the queue first, and
+    items with equal priority leave in the order they arrived.
+
+    The queue keeps running statistics, updated on every put and get, of
+    queue length (number of items) and of samples queued (items x samples in
+    each item): current value, exact maximum, and time-weighted mean. Entity
+    batch sizes are not sample counts after collation and splitting, so
+    samples in each item are set for the queue (ScenarioPlan queue_units).
+
+    Attributes
+    ----------
+    _env: Reference to SimPy environment object
+    max_length: Maximum queue length since statistics were reset (int)
+    max_samples: Maximum samples queued since statistics were reset
+    samples: Samples currently queued
+    units: Samples in each queued item
+
+    Methods
+    -------
+    empty:
+        Returns True if queue is empty
+
+    get:
+        Remove and return next (priority, entity) item
+
+    get_many:
+        Remove and return list of next n (priority, entity) items
+
+    mean_length:
+        Time-weighted mean queue length since statistics were reset
+
+    mean_samples:
+        Time-weighted mean samples queued since statistics were reset
+
+    peek:
+        Return next (priority, entity) item without removing it
+
+    put:
+        Add (priority, entity) item to queue
+
+    qsize:
+        Returns number of items in queue
+
+    reset_stats:
+        Restart queue length statistics (e.g. at end of warm up)
+
+    """
+
+    def __init__(self, _env, units=1):
+        """
+        Constructor method for queue
+
+        Paramters
+        ---------
+        _env : SimPy environment object
+            Reference to SimPy environment object (used for time-weighted
+            statistics)
+        units : int
+            Samples in each queued item
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self._env = _env
+        self._heap = []
+        self._item_count = 0
+        self._length_area = 0.0
+        self._samples_area = 0.0
+        self._last_change = _env.now
+        self._stats_start = _env.now
+        self.max_length = 0
+        self.max_samples = 0
+        self.samples = 0
+        self.units = units
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _record_length(self):
+        """Add area under queue length and samples curves since last
+        change"""
+        now = self._env.now
+        duration = now - self._last_change
+        self._length_area += len(self._heap) * duration
+        self._samples_area += self.samples * duration
+        self._last_change = now
+
+    def empty(self):
+        return not self._heap
+
+    def get(self):
+        self._record_length()
+        priority, _order, entity = heapq.heappop(self._heap)
+        self.samples -= self.units
+        return (priority, entity)
+
+    def get_many(self, n):
+        self._record_length()
+        items = []
+        for _i in range(n):
+            priority, _order, entity = heapq.heappop(self._heap)
+            self.samples -= self.units
+            items.append((priority, entity))
+        return items
+
+    def mean_length(self):
+        self._record_length()
+        duration = self._env.now - self._stats_start
+        if duration <= 0:
+            return float(len(self._heap))
+        return self._length_area / duration
+
+    def mean_samples(self):
+        self._record_length()
+        duration = self._env.now - self._stats_start
+        if duration <= 0:
+            return float(self.samples)
+        return self._samples_area / duration
+
+    def peek(self):
+        priority, _order, entity = self._heap[0]
+        return (priority, entity)
+
+    def put(self, item):
+        self._record_length()
+        # Count of items added keeps equal priorities in order of arrival
+        self._item_count += 1
+        heapq.heappush(self._heap, (item[0], self._item_count, item[1]))
+        self.samples += self.units
+        if len(self._heap) > self.max_length:
+            self.max_length = len(self._heap)
+        if self.samples > self.max_samples:
+            self.max_samples = self.samples
+
+    def qsize(self):
+        return len(self._heap)
+
+    def reset_stats(self):
+        self._length_area = 0.0
+        self._samples_area = 0.0
+        self._last_change = self._env.now
+        self._stats_start = self._env.now
+        self.max_length = len(self._heap)
+        self.max_samples = self.samples
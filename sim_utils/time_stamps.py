@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class TimeStampStore:
+    """
+    Columnar store of entity time stamps for a model run.
+
+    Time stamps are held in a NumPy table with one column per time stamp (e.g.
+    'time_in', 'pcr_in', 'pcr_out') and one row per entity in the model. An
+    entity holds only its row number. When a process step creates a new
+    entity the parent row is copied to a new row, and rows of entities that
+    have left the model are recycled, so the table size is bounded by the
+    number of entities in the model at any one time rather than by run
+    length. Time stamps not recorded are NaN.
+
+    Attributes
+    ----------
+    column_ids: Time stamp name -> column (dictionary)
+    columns: Time stamp names (tuple)
+
+    Methods
+    -------
+    copy_row:
+        Copy time stamps to a new row (returns new row)
+
+    get_rows:
+        Return time stamps for a list of rows (NumPy array)
+
+    new_row:
+        Return a new (empty) row
+
+    release:
+        Return row for re-use
+
+    stamp:
+        Record time stamp
+
+    """
+
+    def __init__(self, columns, initial_rows=1024):
+        """
+        Constructor method for time stamp store
+
+        Parameters
+        ----------
+        columns : list
+            Time stamp names
+        initial_rows : int
+            Number of rows to allocate initially (table grows as needed)
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self.columns = tuple(columns)
+        self.column_ids = {column: i for i, column in enumerate(self.columns)}
+        self._table = np.full((initial_rows, len(self.columns)), np.nan)
+        # Free rows (lowest row used first)
+        self._free_rows = list(range(initial_rows - 1, -1, -1))
+
+    def copy_row(self, row):
+        new_row = self.new_row()
+        self._table[new_row] = self._table[row]
+        return new_row
+
+    def get_rows(self, rows):
+        return self._table[rows]
+
+    def new_row(self):
+        if not self._free_rows:
+            # Double table size
+            rows = self._table.shape[0]
+            self._table = np.concatenate(
+                [self._table, np.full_like(self._table, np.nan)])
+            self._free_rows = list(range(2 * rows - 1, rows - 1, -1))
+        row = self._free_rows.pop()
+        self._table[row] = np.nan
+        return row
+
+    def release(self, row):
+        self._free_rows.append(row)
+
+    def stamp(self, row, column, time):
+        self._table[row, self.column_ids[column]] = time
@@ -0,0 +1,75 @@
+import simpy
+
+
+class TrackedResource(simpy.PriorityResource):
+    """
+    SimPy PriorityResource that keeps exact time-weighted use. The time on
+    shift, and the area under the resources-in-use curve while on shift, are
+    updated whenever a request is granted or released and whenever the
+    roster opens or closes the resource pool, so utilisation needs no
+    sampling.
+
+    Attributes
+    ----------
+    busy_on_shift_time: Time x resources in use, while on shift (see `usage`)
+    on_shift: Whether the resource pool is open (bool)
+    on_shift_time: Time on shift (see `usage`)
+
+    Methods
+    -------
+    set_on_shift:
+        Open (True) or close (False) the resource pool
+
+    usage:
+        Return busy time on shift and time on shift, up to now
+
+    """
+
+    def __init__(self, env, capacity=1, on_shift=True):
+        """
+        Constructor method for tracked resource
+
+        Parameters
+        ----------
+        env : SimPy environment object
+        capacity : int
+            Number of resources
+        on_shift : bool
+            Whether the resource pool is open at the start
+
+        Returns
+        -------
+        None.
+
+        """
+
+        super().__init__(env, capacity)
+        self.on_shift = on_shift
+        self.busy_on_shift_time = 0.0
+        self.on_shift_time = 0.0
+        self._last_change = env.now
+
+    def _accumulate(self):
+        """Add use since the last change of resources in use or shift"""
+        now = self._env.now
+        if self.on_shift:
+            elapsed = now - self._last_change
+            self.on_shift_time += elapsed
+            self.busy_on_shift_time += len(self.users) * elapsed
+        self._last_change = now
+
+    def _do_put(self, event):
+        self._accumulate()
+        return super()._do_put(event)
+
+    def _do_get(self, event):
+        self._accumulate()
+        return super()._do_get(event)
+
+    def set_on_shift(self, on_shift):
+        self._accumulate()
+        self.on_shift = on_shift
+
+    def usage(self):
+        self._accumulate()
+        return self.busy_on_shift_time, self.on_shift_time
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+class Trackers:
+    """
+    Counters of jobs and staff (FTE) in process steps (the 'tracker_*'
+    entries of scenario resources), and of staff on break. Trackers are
+    plain counters rather than SimPy resources: they are changed when a job
+    takes or returns the resources of a process step, and take no part in
+    resource allocation.
+
+    Each tracker keeps the area under its count (time x count) for each hour
+    run, updated whenever the count changes, so hourly means are exact
+    time-weighted means.
+
+    Trackers are identified by their ScenarioPlan tracker ids.
+
+    Attributes
+    ----------
+    counts: Current count, by tracker id (list)
+    names: Tracker names, by tracker id (tuple)
+
+    Methods
+    -------
+    change:
+        Add to the count of trackers
+
+    hourly_means:
+        Return time-weighted mean count of each tracker for each hour of the
+        day, over whole days after warm up (DataFrame)
+
+    """
+
+    def __init__(self, _process):
+
+        self._env = _process._env
+        self.names = _process._plan.tracker_names
+        self.counts = [0] * len(self.names)
+        self._hour_duration = _process._params.day_duration / 24
+        self._last_change = [self._env.now] * len(self.names)
+        # Area under count in each hour run (list by hour of lists by
+        # tracker id)
+        self._hourly_area = []
+
+    def _accumulate(self, tracker, now):
+        """Add area under count of tracker since its last change, split
+        between the hours run"""
+        last = self._last_change[tracker]
+        count = self.counts[tracker]
+        if count != 0:
+            hour = int(last // self._hour_duration)
+            while last < now:
+                end = min(now, (hour + 1) * self._hour_duration)
+                while len(self._hourly_area) <= hour:
+                    self._hourly_area.append([0.0] * len(self.names))
+                self._hourly_area[hour][tracker] += count * (end - last)
+                last = end
+                hour += 1
+        self._last_change[tracker] = now
+
+    def change(self, trackers, amount):
+        """Add `amount` to the count of each tracker (tracker ids)"""
+        now = self._env.now
+        for tracker in trackers:
+            self._accumulate(tracker, now)
+            self.counts[tracker] += amount
+
+    def hourly_means(self, first_day=0):
+        """Time-weighted mean count of each tracker for each hour of the day,
+        over whole days run from `first_day`"""
+        now = self._env.now
+        for tracker in range(len(self.names)):
+            self._accumulate(tracker, now)
+
+        hours = int(now // (self._hour_duration * 24)) * 24
+        area = np.zeros((hours, len(self.names)))
+        recorded = min(hours, len(self._hourly_area))
+        if recorded > 0:
+            area[:recorded] = self._hourly_area[:recorded]
+        area = area[first_day * 24:].reshape(-1, 24, len(self.names))
+
+        if area.shape[0] > 0:
+            means = area.mean(axis=0) / self._hour_duration
+        else:
+            means = np.full((24, len(self.names)), np.nan)
+        return pd.DataFrame(means, index=pd.Index(range(24), name='hour'),
+                            columns=list(self.names))
@@ -0,0 +1,48 @@
+class VariateBuffer:
+    """
+    Buffer of random variates drawn in blocks. Drawing one variate at a time
+    from NumPy has a call overhead of microseconds, which dominates for
+    simple distributions drawn on every job at every process step. The buffer
+    draws a block of variates in one vectorised call, hands them out one at a
+    time (as Python floats), and draws a new block when the buffer is empty.
+
+    Variates come from a seeded NumPy Generator (see RandomStreams), so runs
+    remain reproducible from their seed.
+
+    Methods
+    -------
+    next:
+        Return next variate
+    """
+
+    def __init__(self, draw, block_size=1024):
+        """
+        Constructor method for variate buffer
+
+        Parameters
+        ----------
+        draw : function
+            Function returning a NumPy array of variates for keyword argument
+            `size` (e.g. a Generator method with distribution arguments
+            bound by functools.partial)
+        block_size : int
+            Number of variates drawn at a time
+
+        Returns
+        -------
+        None.
+
+        """
+
+        self._block_size = block_size
+        self._draw = draw
+        self._index = 0
+        self._values = []
+
+    def next(self):
+        if self._index == len(self._values):
+            self._values = self._draw(size=self._block_size).tolist()
+            self._index = 0
+        value = self._values[self._index]
+        self._index += 1
+        return value
@@ -0,0 +1,26 @@
+import contextlib
+import io
+
+from sim_utils.model import Model
+from sim_utils.parameters import Scenario
+
+
+def run_model(**kwargs):
+    model = Model(Scenario(**kwargs), seed=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.run()
+    return model
+
+
+def test_fixed_warm_up_keeps_sketches_by_priority_only():
+    sink = run_model(run_days=3, warm_up_days=1).process.completion_sink
+    assert len(sink.sketches) > 0
+    assert {day for day, _priority in sink.sketches} == {1}
+
+
+def test_mser_warm_up_keeps_days_only_in_search_window():
+    model = run_model(run_days=3, warm_up_days=1, warm_up_mode='mser')
+    sink = model.process.completion_sink
+    # 4 days run: days 0 and 1 may be detected as warm up
+    assert sink.last_bucket == 2
+    assert {day for day, _priority in sink.sketches} <= {0, 1, 2}
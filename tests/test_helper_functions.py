@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from sim_utils.helper_functions import (confidence_interval, mser_truncation,
+                                        t_critical)
+
+
+@pytest.mark.parametrize('confidence, degrees_of_freedom, expected', [
+    (0.95, 9, 2.262), (0.95, 1, 12.706), (0.95, 30, 2.042),
+    (0.90, 4, 2.132), (0.99, 20, 2.845)])
+def test_t_critical_matches_tables(confidence, degrees_of_freedom, expected):
+    assert t_critical(confidence, degrees_of_freedom) == \
+        pytest.approx(expected, abs=5e-4)
+
+
+def test_confidence_interval():
+    values = [1.0, 2.0, 3.0, 4.0, np.nan]
+    mean, half_width = confidence_interval(values)
+    assert mean == 2.5
+    assert half_width == pytest.approx(
+        t_critical(0.95, 3) * np.std(values[:4], ddof=1) / 2)
+    assert np.isnan(confidence_interval([1.0])[1])
+
+
+def test_mser_deletes_initial_transient():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([np.linspace(20, 12, 6),
+                             10 + rng.normal(0, 1, 40)])
+    assert 5 <= mser_truncation(values) <= 7
+
+
+def test_mser_matches_direct_calculation():
+    values = np.random.default_rng(2).normal(0, 1, 30)
+    errors = [np.sum((values[d:] - values[d:].mean()) ** 2) / (30 - d) ** 2
+              for d in range(16)]
+    assert mser_truncation(values) == int(np.argmin(errors))
+
+
+def test_mser_limited_to_max_fraction():
+    # Trend never settles: truncation point at limit
+    assert mser_truncation(np.arange(20.0), max_fraction=0.25) == 5
+    assert mser_truncation([1.0]) == 0
@@ -0,0 +1,19 @@
+from sim_utils.parameters import Scenario
+from sim_utils.results import ResultSchema
+
+
+def test_run_length_follows_changes_after_construction():
+    scenario = Scenario(run_days=3, warm_up_days=2)
+    assert scenario.result_days == 3
+    assert scenario.run_length == 5 * scenario.day_duration
+
+    scenario.warm_up_mode = 'mser'
+    scenario.run_days = 4
+    assert scenario.audit_warm_up == 2 * scenario.day_duration
+    assert scenario.result_days == 6
+    assert scenario.run_length == 6 * scenario.day_duration
+
+    # Results schema keeps all days of results
+    rows = dict((key, rows) for key, rows, _columns in
+                ResultSchema(scenario).tables)
+    assert rows['output_by_day'] == list(range(1, 7))
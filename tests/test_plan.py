@@ -0,0 +1,49 @@
+import pickle
+
+import pytest
+
+from sim_utils.parameters import Scenario
+from sim_utils.plan import ScenarioPlan
+
+
+def test_plan_is_immutable():
+    plan = ScenarioPlan(Scenario())
+    with pytest.raises(AttributeError):
+        plan.resource_names = ()
+    with pytest.raises(TypeError):
+        plan.resource_ids['extra'] = 0
+    with pytest.raises(ValueError):
+        plan.resource_numbers[0] = 0
+
+
+def test_plan_immutable_after_pickling():
+    plan = pickle.loads(pickle.dumps(ScenarioPlan(Scenario())))
+    assert plan.resource_ids['human_pcr_1'] == \
+        plan.resource_names.index('human_pcr_1')
+    with pytest.raises(TypeError):
+        plan.process_resources['pcr']['human_list'] = ()
+    with pytest.raises(ValueError):
+        plan.resource_timetable[0, 0] = True
+
+
+def test_resource_timetable_follows_shifts():
+    shift_hours = dict(Scenario().resource_shift_hours)
+    shift_hours['human_pcr_1'] = [(9.0, 17.0), (0.0, 0.0)]
+    plan = ScenarioPlan(Scenario(roster_days=2,
+                                 resource_shift_hours=shift_hours))
+    on_shift = plan.resource_timetable[plan.resource_ids['human_pcr_1']]
+    day = plan.roster_minutes // 2
+    # On shift for minutes starting in 9:00-17:00 on the first day only
+    assert not on_shift[9 * 60 - 1]
+    assert on_shift[9 * 60] and on_shift[17 * 60 - 1]
+    assert not on_shift[17 * 60]
+    assert on_shift[day:].sum() == 0
+    assert {9 * 60, 17 * 60} <= set(plan.shift_change_minutes)
+
+
+def test_roster_must_give_shift_for_each_day():
+    shift_hours = dict(Scenario().resource_shift_hours)
+    shift_hours['human_pcr_1'] = [(9.0, 17.0)]
+    with pytest.raises(ValueError):
+        ScenarioPlan(Scenario(roster_days=2,
+                              resource_shift_hours=shift_hours))
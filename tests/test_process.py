@@ -0,0 +1,29 @@
+import contextlib
+import io
+
+from sim_utils.model import Model
+from sim_utils.parameters import Scenario
+from sim_utils.replication import model_results
+
+
+def run_output(dispatch_mode, seed):
+    model = Model(Scenario(run_days=2, warm_up_days=1,
+                           dispatch_mode=dispatch_mode), seed=seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.run()
+    return model_results(model)['output']['Result']
+
+
+def test_event_and_poll_dispatch_are_equivalent():
+    # Event dispatch assigns jobs at the time they become ready rather than
+    # on the next whole minute, so process times may differ slightly
+    event = run_output('event', 1)
+    poll = run_output('poll', 1)
+    assert event['input'] == poll['input']
+    assert abs(event['output'] - poll['output']) <= 0.05 * poll['input']
+    assert (abs(event['median_process_time_hours'] -
+                poll['median_process_time_hours']) <= 0.5)
+
+
+def test_event_dispatch_is_reproducible():
+    assert run_output('event', 2).equals(run_output('event', 2))
@@ -0,0 +1,43 @@
+import pickle
+
+import numpy as np
+
+from sim_utils.quantile_sketch import QuantileSketch
+
+
+def queue_times():
+    """Queue times (minutes) over the range seen in model runs"""
+    rng = np.random.default_rng(1)
+    return rng.exponential(120, size=100_000).tolist()
+
+
+def test_quantiles_within_relative_accuracy():
+    values = queue_times()
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    for q in (0.25, 0.5, 0.75, 0.95):
+        exact = np.quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.02 * exact
+
+
+def test_bins_and_payload_bounded():
+    sketch = QuantileSketch()
+    for value in queue_times():
+        sketch.add(value)
+    # Bins grow with range of values, not number of values
+    assert len(sketch._bins) < 1000
+    # Returned from worker processes with each run
+    assert len(pickle.dumps(sketch, protocol=pickle.HIGHEST_PROTOCOL)) < 2500
+
+
+def test_pickled_sketch_unchanged():
+    sketch = QuantileSketch()
+    for value in queue_times()[:1000] + [0.0]:
+        sketch.add(value)
+    copy = pickle.loads(pickle.dumps(sketch))
+    assert copy._bins == sketch._bins
+    assert copy.count == sketch.count
+    assert copy.quantile(0.5) == sketch.quantile(0.5)
+    empty = pickle.loads(pickle.dumps(QuantileSketch()))
+    assert empty.count == 0 and np.isnan(empty.quantile(0.5))
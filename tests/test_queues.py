@@ -0,0 +1,58 @@
+from sim_utils.entity import Entity
+from sim_utils.model import Model
+from sim_utils.parameters import Scenario
+
+
+def set_up_model():
+    model = Model(Scenario(), seed=1)
+    model.set_up()
+    return model
+
+
+def put_basic_batches(process, queue, batches):
+    """Put basic batches of samples (one item each) in queue"""
+    for i in range(batches):
+        entity = Entity(batch_size=process._params.basic_batch_size,
+                        entity_id=i, last_queue=queue, priority=100 + i,
+                        time_stamp_row=process.time_stamps.new_row())
+        process.queues[queue].put((entity.priority, entity))
+
+
+def move_items(process, from_queue, to_queue):
+    """Move queued items between queues (as a process step would)"""
+    while not process.queues[from_queue].empty():
+        process.queues[to_queue].put(process.queues[from_queue].get())
+
+
+def test_collation_queue_samples_match_real_samples():
+    model = set_up_model()
+    process = model.process
+    params = model._params
+    queues = process.queues
+    batches = params.heat_batch_size * params.transfer_1_batch_size
+    samples = batches * params.basic_batch_size
+
+    put_basic_batches(process, 'q_heat_collation', batches)
+    assert queues['q_heat_collation'].samples == samples
+
+    # Collation keeps samples
+    process.process_steps.collate(params.heat_batch_size,
+                                  'q_heat_collation', 'q_heat')
+    assert queues['q_heat_collation'].samples == 0
+    assert queues['q_heat'].samples == samples
+
+    # Split and collate again (entity batch sizes no longer match samples)
+    move_items(process, 'q_heat', 'q_heat_split')
+    process.process_steps.split(params.heat_batch_size, 'q_heat_split',
+                                'q_transfer_1_collation')
+    assert queues['q_transfer_1_collation'].samples == samples
+    process.process_steps.collate(params.transfer_1_batch_size,
+                                  'q_transfer_1_collation', 'q_transfer_1')
+    assert queues['q_transfer_1'].samples == samples
+    assert queues['q_transfer_1'].max_samples == samples
+
+
+def test_arrival_batches_not_counted_as_samples():
+    model = set_up_model()
+    put_basic_batches(model.process, 'q_batch_input', 2)
+    assert model.process.queues['q_batch_input'].samples == 0
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from sim_utils.random_streams import RandomStreams
+
+
+def test_seed_reproduces_streams():
+    streams = RandomStreams(None, ('step_a',))
+    again = RandomStreams(streams.seed, ('step_a',))
+    assert streams.arrivals.random() == again.arrivals.random()
+    assert (streams.process_steps['step_a'].random() ==
+            again.process_steps['step_a'].random())
+
+
+def test_seed_sequence_rejected():
+    child = np.random.SeedSequence(1).spawn(1)[0]
+    with pytest.raises(TypeError):
+        RandomStreams(child)
@@ -0,0 +1,101 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sim_utils.parameters import Scenario
+from sim_utils.replication import Replicator
+
+
+def replicator_with_kpis(kpis):
+    """Replicator whose run KPIs are given (index scenario name and run)"""
+    replicator = Replicator({'base': Scenario()}, 3)
+    replicator.run_kpis = lambda: kpis
+    return replicator
+
+
+def run_kpis(values):
+    index = pd.MultiIndex.from_product([['base'], range(len(values))],
+                                       names=['name', 'run'])
+    return pd.DataFrame(values, index=index)
+
+
+def test_precision_of_kpis_not_produced_or_with_zero_mean():
+    kpis = run_kpis({'demand_met': [0.8, 0.9, 0.85],
+                     'zero_mean': [-1.0, 1.0, 0.0],
+                     'complete_24_hrs_2': [np.nan] * 3})
+    precision = replicator_with_kpis(kpis).kpi_precision(
+        ['demand_met', 'zero_mean', 'complete_24_hrs_2', 'missing'])
+    assert list(precision) == ['demand_met', 'zero_mean',
+                               'complete_24_hrs_2', 'replications']
+    assert 0 < precision.loc['base', 'demand_met'] < np.inf
+    assert np.isnan(precision.loc['base', 'zero_mean'])
+    assert np.isnan(precision.loc['base', 'complete_24_hrs_2'])
+    assert precision.loc['base', 'replications'] == 3
+
+
+def test_precision_of_single_run_not_yet_known():
+    precision = replicator_with_kpis(run_kpis({'demand_met': [0.8]})) \
+        .kpi_precision(['demand_met'])
+    assert precision.loc['base', 'demand_met'] == np.inf
+
+
+def registered_samples_per_day(name):
+    """Samples per day of scenario registered in worker process"""
+    from sim_utils.replication import _worker_scenarios
+    return _worker_scenarios[name][0].samples_per_day
+
+
+def test_workers_see_scenario_changed_in_place():
+    scenario = Scenario()
+    replicator = Replicator({'base': scenario}, 1, n_jobs=1)
+    executor = replicator.get_executor()
+    assert executor.submit(registered_samples_per_day, 'base').result() == \
+        scenario.samples_per_day
+
+    scenario.samples_per_day += 1000
+    executor = replicator.get_executor()
+    assert executor.submit(registered_samples_per_day, 'base').result() == \
+        scenario.samples_per_day
+
+
+def test_forked_runs_marked_and_not_used_as_independent():
+    replicator = Replicator(
+        {'base': Scenario(run_days=1, warm_up_days=1)}, 2, n_jobs=1, seed=1)
+    replicator.report_results = replicator.collate_results
+    with contextlib.redirect_stdout(io.StringIO()):
+        replicator.run_scenarios_from_warm_up()
+    assert replicator.forked
+
+    with pytest.warns(UserWarning, match='shared warm up'):
+        replicator.kpi_precision(['demand_met'])
+    with pytest.raises(ValueError, match='shared warm up'):
+        replicator.run_scenarios_adaptive()
+    with pytest.raises(ValueError, match='shared warm up'):
+        replicator.run_selection()
+
+
+def test_paired_differences_remove_shared_noise():
+    noise = np.random.default_rng(1).normal(0, 0.1, 10)
+    index = pd.MultiIndex.from_product([['base', 'alt'], range(10)],
+                                       names=['name', 'run'])
+    kpis = pd.DataFrame({'demand_met': np.concatenate([noise, noise + 0.05])},
+                        index=index)
+    replicator = Replicator({'base': Scenario(), 'alt': Scenario()}, 10,
+                            crn=True)
+    replicator.run_kpis = lambda: kpis
+    replicator.compare_scenarios()
+    difference = replicator.paired_differences.loc[('demand_met', 'alt')]
+    assert difference['mean_difference'] == pytest.approx(0.05)
+    assert difference['upper'] - difference['lower'] == pytest.approx(0)
+
+
+def test_common_random_numbers_share_run_seeds():
+    scenarios = {'base': Scenario(), 'alt': Scenario()}
+    crn = Replicator(scenarios, 2, seed=1, crn=True)
+    assert crn.run_seed('base', 1) == crn.run_seed('alt', 1)
+    assert crn.run_seed('base', 0) != crn.run_seed('base', 1)
+    independent = Replicator(scenarios, 2, seed=1)
+    assert independent.run_seed('base', 1) != independent.run_seed('alt', 1)
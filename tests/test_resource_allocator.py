@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import simpy
+
+from sim_utils.parameters import Scenario
+from sim_utils.plan import ScenarioPlan
+from sim_utils.resource_allocator import ResourceAllocator
+
+
+def allocator(available):
+    """Allocator over resources with ids 0, 1, ... (all on shift)"""
+    process = SimpleNamespace(
+        _env=simpy.Environment(), _params=None,
+        resources_available=list(available),
+        resources_occupied=[0] * len(available),
+        resources_on_shift=[True] * len(available))
+    return ResourceAllocator(process), process
+
+
+def test_all_or_nothing():
+    resource_allocator, process = allocator([1, 0])
+    event = resource_allocator.acquire(((0,), (1,)), 100)
+    # Resource 0 is free but resource 1 is not, so neither is taken
+    assert not event.triggered
+    assert process.resources_available == [1, 0]
+
+    process.resources_available[1] += 1
+    resource_allocator.wake()
+    assert event.triggered and event.value == [0, 1]
+    assert process.resources_available == [0, 0]
+    assert process.resources_occupied == [1, 1]
+
+
+def test_waiting_jobs_allocated_in_priority_order():
+    resource_allocator, process = allocator([1])
+    first = resource_allocator.acquire(((0,),), 100)
+    low = resource_allocator.acquire(((0,),), 200)
+    high = resource_allocator.acquire(((0,),), 100)
+    assert first.triggered
+
+    resource_allocator.release([0])
+    assert high.triggered and not low.triggered
+    resource_allocator.release([0])
+    assert low.triggered
+
+
+def test_blocked_group_does_not_block_other_groups():
+    resource_allocator, process = allocator([1, 0])
+    blocked = resource_allocator.acquire(((0,), (1,)), 100)
+    other = resource_allocator.acquire(((0,),), 200)
+    # Lower priority job takes resource 0 when higher priority job is blocked
+    assert not blocked.triggered and other.triggered
+
+
+def test_empty_resource_groups_dropped():
+    plan = ScenarioPlan(Scenario())
+    for resources in plan.process_resources.values():
+        for key in ('human_list', 'machine_list'):
+            assert all(len(group) > 0 for group in resources[key])
+    assert plan.process_resources['data_analysis']['machine_list'] == ()
+
+
+def test_parked_job_resumes_when_resource_released():
+    resource_allocator, process = allocator([1])
+    env = process._env
+    times = []
+
+    def job(hold):
+        resources = yield resource_allocator.acquire(((0,),), 100)
+        times.append(env.now)
+        yield env.timeout(hold)
+        resource_allocator.release(resources)
+
+    env.process(job(2.5))
+    env.process(job(1))
+    env.run()
+    # Second job starts at release, not on the next minute
+    assert times == [0, 2.5]
+
+
+def test_parked_job_resumes_when_shift_starts():
+    resource_allocator, process = allocator([1])
+    process.resources_on_shift[0] = False
+    event = resource_allocator.acquire(((0,),), 100)
+    process._env.run(until=60)
+    assert not event.triggered
+
+    process.resources_on_shift[0] = True
+    resource_allocator.wake()
+    assert event.triggered
@@ -0,0 +1,50 @@
+import numpy as np
+
+from sim_utils.parameters import Scenario
+from sim_utils.results import OUTPUT_RESULTS, ResultSchema
+
+
+def test_decode_day_without_output():
+    schema = ResultSchema(Scenario(run_days=2, warm_up_days=1))
+    array = np.full(schema.size, np.nan)
+    start, end = schema._slices['output_by_day']
+    output_by_day = np.full((2, len(OUTPUT_RESULTS)), np.nan)
+    output_by_day[:, OUTPUT_RESULTS.index('input')] = [100, 200]
+    output_by_day[0, OUTPUT_RESULTS.index('output')] = 90
+    array[start:end] = output_by_day.ravel()
+
+    for results in (schema.decode(array),
+                    schema.decode_runs([array, array], 'base')):
+        table = results['output_by_day']
+        assert table['input'].tolist()[:2] == [100, 200]
+        assert table['output'].tolist()[:2] == [90, 0]
+
+
+def test_decode_drops_days_not_run():
+    # Run stopped early: day 3 was never run
+    schema = ResultSchema(Scenario(run_days=3, warm_up_days=1))
+    array = np.full(schema.size, np.nan)
+    start, end = schema._slices['output_by_day']
+    output_by_day = np.full((3, len(OUTPUT_RESULTS)), np.nan)
+    output_by_day[:2, OUTPUT_RESULTS.index('input')] = [100, 200]
+    output_by_day[1, OUTPUT_RESULTS.index('output')] = 90
+    array[start:end] = output_by_day.ravel()
+
+    table = schema.decode(array)['output_by_day']
+    assert table.index.tolist() == [1, 2]
+    assert table['output'].tolist() == [0, 90]
+
+    table = schema.decode_runs([array, array], 'base')['output_by_day']
+    assert table.index.tolist() == [1, 2, 1, 2]
+    assert table['run'].tolist() == [0, 0, 1, 1]
+
+
+def test_max_queues_keep_completed_samples():
+    schema = ResultSchema(Scenario(run_days=2, warm_up_days=1))
+    array = np.full(schema.size, np.nan)
+    start, end = schema._slices['max_queues']
+    array[start:end] = np.arange(end - start)
+
+    max_queues = schema.decode(array)['max_queues']
+    assert max_queues.index[-1] == 'q_completed'
+    assert max_queues['q_completed'] == end - start - 1
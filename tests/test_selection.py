@@ -0,0 +1,45 @@
+import numpy as np
+
+from sim_utils.selection import (allocate, constrained_allocation,
+                                 ocba_allocation,
+                                 probability_correct_selection)
+
+
+def test_allocate_largest_remainder():
+    assert allocate([1, 1, 2], 5).tolist() == [1, 1, 3]
+    assert allocate([0, 0], 3).sum() == 3
+
+
+def test_ocba_follows_ratios():
+    # Targets: best and close competitor (s/d)^2 = 100, distant scenario 1
+    runs = ocba_allocation([1.0, 0.9, 0.0], [1.0, 1.0, 1.0], [0, 0, 0], 100)
+    assert runs.sum() == 100
+    assert abs(runs[0] - 50) <= 1 and abs(runs[1] - 50) <= 1
+    assert runs[2] <= 1
+
+
+def test_ocba_allows_for_runs_already_made():
+    runs = ocba_allocation([1.0, 0.9, 0.0], [1.0, 1.0, 1.0], [40, 0, 0], 20)
+    assert runs.sum() == 20
+    assert runs[1] > runs[0]
+
+
+def test_ocba_minimise():
+    runs = ocba_allocation([0.0, 0.1, 1.0], [1.0, 1.0, 1.0], [0, 0, 0], 100,
+                           maximise=False)
+    assert runs[2] <= 1 and runs[0] + runs[1] >= 99
+
+
+def test_constrained_allocation_favours_scenarios_near_threshold():
+    runs = constrained_allocation([0.5, 0.89, 0.95], [0.05] * 3, 0.9, 10,
+                                  [True, True, False])
+    assert runs.tolist() == [0, 10, 0]
+
+
+def test_probability_correct_selection_grows_with_runs():
+    means, stds = [1.0, 0.9], [1.0, 1.0]
+    few = probability_correct_selection(means, stds, [5, 5])
+    many = probability_correct_selection(means, stds, [500, 500])
+    assert 0 <= few < many <= 1
+    assert np.isclose(probability_correct_selection([1.0, 0.0], [0.1, 0.1],
+                                                    [10, 10]), 1)
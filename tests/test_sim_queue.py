@@ -0,0 +1,32 @@
+import simpy
+
+from sim_utils.sim_queue import SimQueue
+
+
+def test_priority_then_arrival_order():
+    queue = SimQueue(simpy.Environment())
+    for priority, name in [(200, 'a'), (100, 'b'), (200, 'c'), (100, 'd')]:
+        queue.put((priority, name))
+    assert queue.peek() == (100, 'b')
+    assert queue.qsize() == 4
+    assert [queue.get()[1] for _i in range(2)] == ['b', 'd']
+    assert [item[1] for item in queue.get_many(2)] == ['a', 'c']
+    assert queue.empty()
+
+
+def test_time_weighted_statistics():
+    env = simpy.Environment()
+    queue = SimQueue(env, units=10)
+
+    def run():
+        queue.put((1, 'a'))
+        queue.put((1, 'b'))
+        yield env.timeout(10)
+        queue.get()
+        yield env.timeout(10)
+
+    env.process(run())
+    env.run()
+    assert queue.max_length == 2 and queue.max_samples == 20
+    assert queue.mean_length() == 1.5
+    assert queue.mean_samples() == 15